@@ -1,7 +1,12 @@
 from collections import defaultdict
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Union
+from typing import Literal, Optional, Union
+import asyncio
+import math
 import os
+import re
+import time
+import warnings
 
 import discord
 from discord.ext import commands, tasks
@@ -14,6 +19,127 @@ from core.paginator import EmbedPaginatorSession, MessagePaginatorSession
 
 logger = getLogger(__name__)
 
+# Discord's reaction route allows one reaction per 250ms per channel.
+REACTION_INTERVAL = 0.25
+MAX_QUEUED_MESSAGES = 50
+WORKER_IDLE_TIMEOUT = 60
+MAX_REACTION_ATTEMPTS = 3
+RATE_WINDOW = 60
+MAX_RULES = 25
+MAX_PATTERN_LENGTH = 200
+GLOBAL_FLAGS_REGEX = re.compile(r'\(\?[aiLmsux]+\)')
+
+
+class SlidingWindowCounter:
+    """
+    Approximates the number of events in the last ``window`` seconds.
+
+    Only the counts of the current and the previous fixed window are kept,
+    the previous one is weighted by how much of it still overlaps the sliding window.
+    """
+    def __init__(self, window: float = RATE_WINDOW):
+        self.window = window
+        self.window_start = 0
+        self.current = 0
+        self.previous = 0
+
+    def roll(self, now: float):
+        start = now - now % self.window
+        if start != self.window_start:
+            self.previous = self.current if start - self.window_start == self.window else 0
+            self.current = 0
+            self.window_start = start
+
+    def add(self, now: float):
+        self.roll(now)
+        self.current += 1
+
+    def count(self, now: float) -> float:
+        self.roll(now)
+        overlap = 1 - (now - self.window_start) / self.window
+        return self.previous * overlap + self.current
+
+
+class RuleMatcher:
+    """
+    The compiled reaction rules of one channel.
+
+    Keyword and regex rules are combined into a single pattern. Every match position
+    tries each rule in an optional lookahead, so one ``finditer`` pass over the content
+    reports all rules, even ones overlapping each other.
+    Regexes with groups or global inline flags would change meaning inside the combined
+    pattern, they are compiled and searched on their own instead.
+    Role and attachment rules are resolved with set lookups.
+    """
+    def __init__(self, rules: list):
+        self.rules = rules
+        self.role_rules = defaultdict(list)
+        self.attachment_rules = []
+        self.standalone_rules = []
+        patterns = {}
+        for index, rule in enumerate(rules):
+            if rule['type'] == 'keyword':
+                patterns[index] = f'(?i:{re.escape(rule["value"])})'
+            elif rule['type'] == 'regex':
+                if self.combinable(rule['value']):
+                    patterns[index] = f'(?:{rule["value"]})'
+                else:
+                    self.standalone_rules.append((index, re.compile(rule['value'])))
+            elif rule['type'] == 'role':
+                self.role_rules[rule['value']].append(index)
+            elif rule['type'] == 'attachment':
+                self.attachment_rules.append(index)
+        self.pattern = None
+        if patterns:
+            guard = '|'.join(patterns.values())
+            lookaheads = ''.join(f'(?=(?P<rule{i}>{pattern}))?' for i, pattern in patterns.items())
+            self.pattern = re.compile(f'(?=(?:{guard})){lookaheads}')
+        self.text_rules = len(patterns)
+
+    @staticmethod
+    def combinable(pattern: str) -> bool:
+        """
+        Returns whether a regex keeps its meaning inside the combined pattern.
+        """
+        if re.compile(pattern).groups:
+            # Group numbers and names would clash with the ones of other rules.
+            return False
+        if GLOBAL_FLAGS_REGEX.match(pattern):
+            # Global inline flags like ``(?i)`` would apply to every rule of the combined pattern.
+            return False
+        try:
+            # Global flags further in are an error since Python 3.11 and deprecated before.
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', DeprecationWarning)
+                re.compile(f'x(?:{pattern})')
+        except (re.error, DeprecationWarning):
+            return False
+        return True
+
+    def match(self, message: discord.Message) -> list:
+        """
+        Returns the emojis of all rules matching the message, in rule order.
+        """
+        matched = set(self.attachment_rules) if message.attachments else set()
+        if self.role_rules:
+            role_ids = {role.id for role in getattr(message.author, 'roles', ())}
+            for role_id in role_ids & self.role_rules.keys():
+                matched.update(self.role_rules[role_id])
+        if self.pattern is not None and message.content:
+            found = set()
+            for match in self.pattern.finditer(message.content):
+                found.update(name for name, value in match.groupdict().items() if value is not None)
+                if len(found) == self.text_rules:
+                    break
+            matched.update(int(name[4:]) for name in found)
+        if message.content:
+            matched.update(index for index, pattern in self.standalone_rules if pattern.search(message.content))
+        emojis = []
+        for index in sorted(matched):
+            emojis.extend(e for e in self.rules[index]['emojis'] if e not in emojis)
+        return emojis
+
+
 class Autoreact(commands.Cog):
     """
 Automatically reacts with emojis in certain channels.
@@ -25,6 +151,12 @@ You can use this feature in multiple channels with max 20 reactions, but keep in
         self.db = self.bot.plugin_db.get_partition(self)
         self.config = None
         self.default_config = {}
+        self.queues = {}
+        self.workers = {}
+        self.message_rates = {}
+        self.reaction_rates = {}
+        self.message_counts = {}
+        self.matchers = {}
         
     async def cog_load(self):
         self.config = await self.db.find_one({"_id": "autoreact"})
@@ -39,6 +171,16 @@ You can use this feature in multiple channels with max 20 reactions, but keep in
             for key in missing:
                 self.config[key] = self.default_config[key]
         await self.update_config()
+        for key, channel_config in self.config.items():
+            if isinstance(channel_config, dict) and channel_config.get('rules'):
+                try:
+                    self.compile_rules(int(key))
+                except re.error:
+                    logger.exception('Invalid autoreact rules in channel %s', key)
+
+    async def cog_unload(self):
+        for worker in self.workers.values():
+            worker.cancel()
 
     async def update_config(self):
         await self.db.find_one_and_update(
@@ -57,20 +199,22 @@ You can use this feature in multiple channels with max 20 reactions, but keep in
         **Usage:**
         {prefix}startreact 👀
         {prefix}startreact 🍰 😋
+
+        Use ``{prefix}reactrule`` to react only to certain messages instead.
         """
         if not emojis:
             return await ctx.send_help(ctx.command)
         channel_config = self.config.get(str(ctx.channel.id))
-        if channel_config:
+        if channel_config and channel_config['emojis']:
             embed = discord.Embed(title='Channel already activated', description='Channel already activated. Use ``?stopreact`` first.', color=self.bot.error_color)
             return await ctx.send(embed=embed)
         emojis_to_react = [i for i in emojis]
         if len(emojis_to_react) > 20:
             embed = discord.Embed(title='Reactions limited', description='Discord has a limit of 20 reactions per message.', color=self.bot.error_color)
             return await ctx.send(embed=embed)
-        self.config[str(ctx.channel.id)] = {
-            "emojis": emojis_to_react
-        }
+        channel_config = channel_config or self.new_channel_config()
+        channel_config['emojis'] = emojis_to_react
+        self.config[str(ctx.channel.id)] = channel_config
         await self.update_config()
         react_str = ', '.join(emojis_to_react)
         embed = discord.Embed(title='Channel activated', description=f'The bot will autoreact in this channel with the following emojis:\n{react_str}', color=discord.Color.green())
@@ -87,6 +231,7 @@ You can use this feature in multiple channels with max 20 reactions, but keep in
             embed = discord.Embed(title='Channel not activated', description='This channel is not activated yet.', color=self.bot.error_color)
             return await ctx.send(embed=embed)
         self.config.pop(str(ctx.channel.id), None)
+        self.forget_channel(ctx.channel.id)
         await self.db.find_one_and_update(
             {"_id": "autoreact"},
             {"$unset": {str(ctx.channel.id):None}}
@@ -94,17 +239,313 @@ You can use this feature in multiple channels with max 20 reactions, but keep in
         embed = discord.Embed(title='Channel deactivated', description=f'The bot will no longer autoreact in this channel.', color=discord.Color.green())
         return await ctx.send(embed=embed)
     
+    @commands.command(name='reactmode')
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    async def reactmode(self, ctx: commands.Context, mode: Optional[Literal['all', 'rate', 'every']] = None, value: Optional[int] = None):
+        """
+        Sets how many messages get reactions in the current channel.
+
+        Modes:
+        ``all`` - React to every message, automatically sampled down when traffic exceeds the reaction rate limit.
+        ``rate <n>`` - React to at most n messages per minute.
+        ``every <k>`` - React to every k-th message.
+
+        **Usage:**
+        {prefix}reactmode
+        {prefix}reactmode rate 10
+        {prefix}reactmode every 3
+        """
+        channel_config = self.config.get(str(ctx.channel.id))
+        if not channel_config:
+            embed = discord.Embed(title='Channel not activated', description='This channel is not activated yet.', color=self.bot.error_color)
+            return await ctx.send(embed=embed)
+        if mode is None:
+            now = time.monotonic()
+            message_rate = self.message_rates.get(ctx.channel.id, SlidingWindowCounter()).count(now)
+            reaction_rate = self.reaction_rates.get(ctx.channel.id, SlidingWindowCounter()).count(now)
+            embed = discord.Embed(title='Autoreact mode', description=f'Mode: ``{channel_config.get("mode", "all")}`` {channel_config.get("limit") or ""}\nMessages per minute: {message_rate:.0f}\nReacted messages per minute: {reaction_rate:.0f}', color=self.bot.main_color)
+            return await ctx.send(embed=embed)
+        if mode != 'all' and (value is None or value < 1):
+            embed = discord.Embed(title='Value missing', description=f'The ``{mode}`` mode needs a positive number.', color=self.bot.error_color)
+            return await ctx.send(embed=embed)
+        channel_config['mode'] = mode
+        channel_config['limit'] = value if mode != 'all' else None
+        await self.db.find_one_and_update(
+            {"_id": "autoreact"},
+            {"$set": {str(ctx.channel.id): channel_config}}
+        )
+        embed = discord.Embed(title='Mode changed', description=f'Autoreact mode in this channel changed to ``{mode}``.', color=discord.Color.green())
+        return await ctx.send(embed=embed)
+
+    @commands.group(name='reactrule', invoke_without_command=True)
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    async def reactrule(self, ctx: commands.Context):
+        """
+        Manages conditional reactions in the current channel.
+
+        Rules add their emojis to matching messages, on top of the ones set with ``{prefix}startreact``.
+        """
+        await ctx.send_help(ctx.command)
+
+    @reactrule.command(name='keyword')
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    async def reactrule_keyword(self, ctx: commands.Context, keyword: str, *emojis):
+        """
+        Reacts to messages containing a keyword (case insensitive).
+
+        **Usage:**
+        {prefix}reactrule keyword suggestion 👍 👎
+        """
+        await self.add_rule(ctx, 'keyword', keyword, emojis)
+
+    @reactrule.command(name='regex')
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    async def reactrule_regex(self, ctx: commands.Context, pattern: str, *emojis):
+        """
+        Reacts to messages matching a regular expression.
+
+        **Usage:**
+        {prefix}reactrule regex "bug ?report" 🐛
+        """
+        if len(pattern) > MAX_PATTERN_LENGTH:
+            embed = discord.Embed(title='Pattern too long', description=f'Patterns are limited to {MAX_PATTERN_LENGTH} characters.', color=self.bot.error_color)
+            return await ctx.send(embed=embed)
+        channel_config = self.config.get(str(ctx.channel.id)) or {}
+        try:
+            # Validates the pattern together with the other rules it gets combined with.
+            RuleMatcher(channel_config.get('rules', []) + [{"type": "regex", "value": pattern, "emojis": []}])
+        except re.error as error:
+            embed = discord.Embed(title='Invalid pattern', description=f'``{error}``', color=self.bot.error_color)
+            return await ctx.send(embed=embed)
+        await self.add_rule(ctx, 'regex', pattern, emojis)
+
+    @reactrule.command(name='role')
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    async def reactrule_role(self, ctx: commands.Context, role: discord.Role, *emojis):
+        """
+        Reacts to messages of members with a role.
+
+        **Usage:**
+        {prefix}reactrule role @Staff ⭐
+        """
+        await self.add_rule(ctx, 'role', role.id, emojis)
+
+    @reactrule.command(name='attachment')
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    async def reactrule_attachment(self, ctx: commands.Context, *emojis):
+        """
+        Reacts to messages with attachments.
+
+        **Usage:**
+        {prefix}reactrule attachment 📎
+        """
+        await self.add_rule(ctx, 'attachment', None, emojis)
+
+    @reactrule.command(name='list')
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    async def reactrule_list(self, ctx: commands.Context):
+        """
+        Lists the rules of the current channel.
+        """
+        channel_config = self.config.get(str(ctx.channel.id))
+        if not channel_config or not channel_config.get('rules'):
+            embed = discord.Embed(title='No rules', description='This channel has no autoreact rules.', color=self.bot.error_color)
+            return await ctx.send(embed=embed)
+        lines = []
+        for index, rule in enumerate(channel_config['rules'], start=1):
+            if rule['type'] == 'role':
+                target = f'<@&{rule["value"]}>'
+            elif rule['type'] == 'attachment':
+                target = 'any attachment'
+            else:
+                target = f'``{rule["value"]}``'
+            lines.append(f'**{index}.** {rule["type"]} {target}: {", ".join(rule["emojis"])}')
+        embed = discord.Embed(title='Autoreact rules', description='\n'.join(lines), color=self.bot.main_color)
+        return await ctx.send(embed=embed)
+
+    @reactrule.command(name='remove')
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    async def reactrule_remove(self, ctx: commands.Context, number: int):
+        """
+        Removes a rule of the current channel by its number in ``{prefix}reactrule list``.
+        """
+        channel_config = self.config.get(str(ctx.channel.id))
+        if not channel_config or not 0 < number <= len(channel_config.get('rules', [])):
+            embed = discord.Embed(title='Rule not found', description=f'There is no rule number {number} in this channel.', color=self.bot.error_color)
+            return await ctx.send(embed=embed)
+        channel_config['rules'].pop(number - 1)
+        if not channel_config['rules'] and not channel_config['emojis']:
+            self.config.pop(str(ctx.channel.id), None)
+            self.forget_channel(ctx.channel.id)
+            await self.db.find_one_and_update(
+                {"_id": "autoreact"},
+                {"$unset": {str(ctx.channel.id): None}}
+            )
+        else:
+            self.compile_rules(ctx.channel.id)
+            await self.db.find_one_and_update(
+                {"_id": "autoreact"},
+                {"$set": {str(ctx.channel.id): channel_config}}
+            )
+        embed = discord.Embed(title='Rule removed', description=f'Rule number {number} was removed.', color=discord.Color.green())
+        return await ctx.send(embed=embed)
+
+    def new_channel_config(self) -> dict:
+        return {
+            "emojis": [],
+            "mode": "all",
+            "limit": None,
+            "rules": []
+        }
+
+    async def add_rule(self, ctx: commands.Context, rule_type: str, value, emojis: tuple):
+        if not emojis:
+            return await ctx.send_help(ctx.command)
+        if len(emojis) > 20:
+            embed = discord.Embed(title='Reactions limited', description='Discord has a limit of 20 reactions per message.', color=self.bot.error_color)
+            return await ctx.send(embed=embed)
+        channel_config = self.config.get(str(ctx.channel.id)) or self.new_channel_config()
+        rules = channel_config.setdefault('rules', [])
+        if len(rules) >= MAX_RULES:
+            embed = discord.Embed(title='Rules limited', description=f'A channel can have up to {MAX_RULES} rules.', color=self.bot.error_color)
+            return await ctx.send(embed=embed)
+        rules.append({"type": rule_type, "value": value, "emojis": list(emojis)})
+        try:
+            self.compile_rules(ctx.channel.id, channel_config)
+        except re.error as error:
+            rules.pop()
+            embed = discord.Embed(title='Invalid pattern', description=f'``{error}``', color=self.bot.error_color)
+            return await ctx.send(embed=embed)
+        self.config[str(ctx.channel.id)] = channel_config
+        await self.db.find_one_and_update(
+            {"_id": "autoreact"},
+            {"$set": {str(ctx.channel.id): channel_config}},
+            upsert=True,
+        )
+        embed = discord.Embed(title='Rule added', description=f'Added a {rule_type} rule reacting with {", ".join(emojis)}.', color=discord.Color.green())
+        return await ctx.send(embed=embed)
+
+    def compile_rules(self, channel_id: int, channel_config: Optional[dict] = None):
+        """
+        Compiles the rules of a channel, raises ``re.error`` if the combined pattern is invalid.
+        """
+        channel_config = channel_config or self.config[str(channel_id)]
+        if channel_config.get('rules'):
+            self.matchers[channel_id] = RuleMatcher(channel_config['rules'])
+        else:
+            self.matchers.pop(channel_id, None)
+
+    def match_emojis(self, message: discord.Message, channel_config: dict) -> list:
+        """
+        Returns the emojis to add to a message, the channel-wide ones first.
+        """
+        matcher = self.matchers.get(message.channel.id)
+        if matcher is None:
+            return channel_config['emojis']
+        emojis = list(channel_config['emojis'])
+        emojis.extend(e for e in matcher.match(message) if e not in emojis)
+        return emojis[:20]
+
+    def should_react(self, channel_id: int, channel_config: dict, emojis: list) -> bool:
+        """
+        Applies the sampling mode of a channel to an incoming message.
+        """
+        now = time.monotonic()
+        message_rate = self.message_rates.setdefault(channel_id, SlidingWindowCounter())
+        reaction_rate = self.reaction_rates.setdefault(channel_id, SlidingWindowCounter())
+        message_rate.add(now)
+        count = self.message_counts.get(channel_id, 0) + 1
+        self.message_counts[channel_id] = count
+        mode = channel_config.get('mode', 'all')
+        if mode == 'rate':
+            react = reaction_rate.count(now) < channel_config['limit']
+        elif mode == 'every':
+            react = (count - 1) % channel_config['limit'] == 0
+        else:
+            # Sheds load by sampling every k-th message once traffic exceeds what the reaction route allows.
+            capacity = RATE_WINDOW / (REACTION_INTERVAL * max(len(emojis), 1))
+            step = max(math.ceil(message_rate.count(now) / capacity), 1)
+            react = (count - 1) % step == 0
+        if react:
+            reaction_rate.add(now)
+        return react
+
+    def enqueue_reactions(self, message: discord.Message, emojis: list):
+        """
+        Queues a message for the reaction worker of its channel.
+
+        The queue is bounded, messages arriving while it is full are skipped.
+        """
+        channel_id = message.channel.id
+        queue = self.queues.get(channel_id)
+        if queue is None:
+            queue = self.queues[channel_id] = asyncio.Queue(maxsize=MAX_QUEUED_MESSAGES)
+            self.workers[channel_id] = self.bot.loop.create_task(self.reaction_worker(channel_id, queue))
+        try:
+            queue.put_nowait((message, emojis))
+        except asyncio.QueueFull:
+            logger.debug('Autoreact queue of channel %s is full, skipping message %s', channel_id, message.id)
+
+    async def reaction_worker(self, channel_id: int, queue: asyncio.Queue):
+        """
+        Adds the queued reactions of one channel, paced to the reaction route bucket.
+
+        The worker exits after being idle for a while and is recreated on demand.
+        """
+        try:
+            while True:
+                try:
+                    message, emojis = await asyncio.wait_for(queue.get(), WORKER_IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    return
+                for e in emojis:
+                    if not await self.add_reaction(message, e):
+                        # The message was deleted.
+                        break
+        finally:
+            # The channel may have been deactivated and reactivated with a new worker meanwhile.
+            if self.workers.get(channel_id) is asyncio.current_task():
+                del self.workers[channel_id]
+                self.queues.pop(channel_id, None)
+
+    async def add_reaction(self, message: discord.Message, emoji) -> bool:
+        """
+        Adds one reaction, retrying it when rate limited. Returns ``False`` if the message is gone.
+        """
+        for _ in range(MAX_REACTION_ATTEMPTS):
+            started = self.bot.loop.time()
+            try:
+                await message.add_reaction(emoji)
+            except discord.NotFound:
+                return False
+            except discord.RateLimited as error:
+                await asyncio.sleep(error.retry_after)
+                continue
+            except Exception:
+                logger.exception('Error running autoreact', exc_info=True)
+            await asyncio.sleep(max(0, REACTION_INTERVAL - (self.bot.loop.time() - started)))
+            return True
+        return True
+
+    def forget_channel(self, channel_id: int):
+        """
+        Drops the runtime state of a deactivated channel, including reactions still queued.
+        """
+        for state in (self.message_rates, self.reaction_rates, self.message_counts, self.matchers, self.queues):
+            state.pop(channel_id, None)
+        worker = self.workers.pop(channel_id, None)
+        if worker:
+            worker.cancel()
+
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         await self.bot.wait_until_ready()
         channel_config = self.config.get(str(message.channel.id))
-        if channel_config:
-            emojis = channel_config['emojis']
-            for e in emojis:
-                try:
-                    await message.add_reaction(e)
-                except Exception:
-                    logger.exception('Error running autoreact', exc_info=True)
+        if not channel_config:
+            return
+        emojis = self.match_emojis(message, channel_config)
+        if emojis and self.should_react(message.channel.id, channel_config, emojis):
+            self.enqueue_reactions(message, emojis)
 
 async def setup(bot):
     await bot.add_cog(Autoreact(bot))
\ No newline at end of file
@@ -1,19 +1,182 @@
+import asyncio
+import csv
+import io
+import json
+import tempfile
+from collections import Counter, OrderedDict
+from datetime import timedelta, timezone
+from typing import Literal, Union
+
 import discord
-from discord.ext import commands
-from discord.utils import utcnow
+from discord.ext import commands, tasks
+from discord.utils import format_dt, utcnow
 from motor import motor_asyncio
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
 
 from core import checks
 from core.models import PermissionLevel, getLogger
+from core.paginator import EmbedPaginatorSession
 
 from bot import ModmailBot
 
 logger = getLogger(__name__)
 
 
+class ClaimCache:
+    """
+    LRU cache of claim documents keyed by channel ID.
+
+    Channels without a claim are cached as ``None``, so unclaimed threads are served from memory as well.
+    """
+
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def __contains__(self, channel_id) -> bool:
+        return str(channel_id) in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, channel_id):
+        key = str(channel_id)
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def set(self, channel_id, thread_data):
+        key = str(channel_id)
+        self._data[key] = thread_data
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def drop(self, channel_id):
+        self._data.pop(str(channel_id), None)
+
+    def drop_document(self, document_id):
+        for key, thread_data in self._data.items():
+            if thread_data is not None and thread_data.get("_id") == document_id:
+                del self._data[key]
+                return
+
+    def clear(self):
+        self._data.clear()
+
+
+class ClaimInvalidator:
+    """
+    Propagates claim changes to the caches of all bot instances sharing the database.
+
+    A Mongo change stream is used when the deployment supports it (replica sets).
+    Otherwise every change bumps a version counter document, which also keeps the
+    last changed channel IDs, and the other instances poll it.
+    The polling mode only uses ``find_one`` and ``find_one_and_update``, so it can be
+    exercised against an in-memory stand-in of the collection.
+    """
+
+    def __init__(self, db, cache: ClaimCache, poll_interval: float = 2, history: int = 200):
+        self.db = db
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.history = history
+        self.version = 0
+        self.polling = True
+        self.task = None
+
+    async def start(self):
+        version = await self.db.find_one({"_id": "claim_version"})
+        self.version = version["version"] if version else 0
+        self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    async def run(self):
+        while True:
+            try:
+                await self.watch()
+            except (OperationFailure, NotImplementedError):
+                logger.info("Change streams are not available, polling claim changes instead.")
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Claim change stream failed, restarting.")
+                # Changes may have been missed while the stream was down.
+                self.cache.clear()
+                await asyncio.sleep(self.poll_interval)
+        self.polling = True
+        await self.poll()
+
+    async def watch(self):
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+        async with self.db.watch(pipeline, full_document="updateLookup") as stream:
+            self.polling = False
+            async for change in stream:
+                if change["operationType"] == "delete":
+                    self.cache.drop_document(change["documentKey"]["_id"])
+                    continue
+                thread_data = change.get("fullDocument")
+                if thread_data is None:
+                    self.cache.drop_document(change["documentKey"]["_id"])
+                elif "channel_id" in thread_data:
+                    self.cache.set(thread_data["channel_id"], thread_data)
+
+    async def poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Polling claim changes failed.")
+                # Changes may have been missed, the cache is refilled from the database.
+                self.cache.clear()
+
+    async def poll_once(self):
+        version = await self.db.find_one({"_id": "claim_version"})
+        if version is None or version["version"] <= self.version:
+            return
+        missed = version["version"] - self.version
+        if missed > len(version["changes"]):
+            self.cache.clear()
+        else:
+            for channel_id in version["changes"][-missed:]:
+                self.cache.drop(channel_id)
+        self.version = version["version"]
+
+    async def publish(self, *channel_ids):
+        """
+        Announces changed claims to the other instances, only needed when polling.
+        """
+        if not self.polling or not channel_ids:
+            return
+        version = await self.db.find_one_and_update(
+            {"_id": "claim_version"},
+            {
+                "$inc": {"version": len(channel_ids)},
+                "$push": {"changes": {"$each": [str(i) for i in channel_ids], "$slice": -self.history}},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if version["version"] == self.version + len(channel_ids):
+            # Nobody else changed anything in between, skip our own changes.
+            self.version = version["version"]
+
+
+def as_utc(dt):
+    # Mongo returns naive datetimes in UTC.
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
 async def claim_check(ctx):
     cog = ctx.bot.get_cog("Claim")
-    thread_data = await cog.db.find_one({"channel_id": str(ctx.thread.channel.id)})
+    thread_data = await cog.get_claim(ctx.thread.channel.id)
     allowed_to_reply = False
     if thread_data is None:
         if cog.config["require_claim"] is False:
@@ -38,10 +201,14 @@ class Claim(commands.Cog):
     def __init__(self, bot: ModmailBot):
         self.bot: ModmailBot = bot
         self.db: motor_asyncio.AsyncIOMotorCollection = bot.api.get_plugin_partition(self)
+        self.events: motor_asyncio.AsyncIOMotorCollection = self.db["events"]
         self.reply_commands = ["reply", "areply", "freply", "fareply", "fareply", "preply", "pareply"]
         self.config = {}
-        self.default_config = {"require_claim": True}
+        self.default_config = {"require_claim": True, "auto_assign_role": None}
         self.initialized = False
+        self.cache = ClaimCache()
+        self.invalidator = ClaimInvalidator(self.db, self.cache)
+        self.claim_loads = Counter()
 
     async def cog_load(self):
         """
@@ -60,11 +227,15 @@ class Claim(commands.Cog):
                 for key in missing:
                     self.config[key] = self.default_config[key]
             await self.update_config()
+            await self.create_indexes()
 
             for i in self.reply_commands:
                 cmd = self.bot.get_command(i)
                 if not claim_check in cmd.checks:
                     cmd.add_check(claim_check)
+            await self.invalidator.start()
+            self.bot.loop.create_task(self.warm_cache())
+            self.sweep_orphaned_claims.start()
             self.initialized = True
 
     async def update_config(self):
@@ -74,16 +245,208 @@ class Claim(commands.Cog):
             upsert=True,
         )
 
+    async def create_indexes(self):
+        try:
+            await self.db.create_index(
+                "channel_id",
+                unique=True,
+                partialFilterExpression={"channel_id": {"$exists": True}},
+            )
+        except OperationFailure:
+            logger.warning(
+                "Could not create the unique channel_id index, remove duplicate claims to fix this.",
+                exc_info=True,
+            )
+        await self.db.create_index([("claimers", 1), ("claimed_at", 1)])
+        await self.db.create_index([("main_claimer", 1), ("claimed_at", 1)])
+        await self.events.create_index("t")
+        await self.events.create_index([("c", 1), ("t", 1)])
+
+    async def warm_cache(self):
+        """
+        Loads the claims of all open threads into the cache and counts the active claims per main claimer.
+        """
+        await self.bot.wait_until_ready()
+        async for load in self.db.aggregate(
+            [
+                {"$match": {"main_claimer": {"$exists": True}}},
+                {"$group": {"_id": "$main_claimer", "count": {"$sum": 1}}},
+            ]
+        ):
+            self.claim_loads[load["_id"]] = load["count"]
+        channel_ids = [
+            str(thread.channel.id) for thread in self.bot.threads.cache.values() if getattr(thread, "channel", None)
+        ][: self.cache.maxsize]
+        if not channel_ids:
+            return
+        claims = {}
+        async for thread_data in self.db.find({"channel_id": {"$in": channel_ids}}):
+            claims[thread_data["channel_id"]] = thread_data
+        for channel_id in channel_ids:
+            if channel_id not in self.cache:
+                self.cache.set(channel_id, claims.get(channel_id))
+        logger.debug("Claim cache warmed with %s threads.", len(channel_ids))
+
+    async def log_event(self, action: str, *channel_ids, actor=None, member=None):
+        """
+        Appends claim events to the event log.
+
+        Records are kept compact: ``t`` time, ``a`` action, ``c`` channel, ``by`` acting member, ``m`` affected member.
+        """
+        now = utcnow()
+        events = []
+        for channel_id in channel_ids:
+            event = {"t": now, "a": action, "c": str(channel_id)}
+            if actor is not None:
+                event["by"] = str(actor)
+            if member is not None:
+                event["m"] = str(member)
+            events.append(event)
+        try:
+            await self.events.insert_many(events, ordered=False)
+        except Exception:
+            logger.exception("Could not write claim events.")
+
+    def track_load(self, member_id, delta: int):
+        member_id = str(member_id)
+        self.claim_loads[member_id] += delta
+        if self.claim_loads[member_id] <= 0:
+            del self.claim_loads[member_id]
+
+    async def get_claim(self, channel_id):
+        """
+        Returns the claim of a thread channel, served from the cache when possible.
+        """
+        if channel_id in self.cache:
+            return self.cache.get(channel_id)
+        thread_data = await self.db.find_one({"channel_id": str(channel_id)})
+        self.cache.set(channel_id, thread_data)
+        return thread_data
+
     async def cog_unload(self):
         """
         Removes the claim check on cog unload/plugin removal.
         """
         self.initialized = False
+        self.sweep_orphaned_claims.cancel()
+        self.invalidator.stop()
+        self.cache.clear()
         for i in self.reply_commands:
             cmd = self.bot.get_command(i)
             if claim_check in cmd.checks:
                 cmd.remove_check(claim_check)
 
+    @commands.Cog.listener()
+    async def on_thread_close(self, thread, closer, silent, delete_channel, message, scheduled):
+        """
+        Removes the claim of a thread when it gets closed.
+        """
+        if thread.channel is None:
+            return
+        channel_id = str(thread.channel.id)
+        thread_data = await self.db.find_one_and_delete({"channel_id": channel_id})
+        self.cache.drop(channel_id)
+        if thread_data:
+            self.track_load(thread_data["main_claimer"], -1)
+            await self.invalidator.publish(channel_id)
+            await self.log_event("closed", channel_id, actor=getattr(closer, "id", None))
+
+    @commands.Cog.listener()
+    async def on_thread_ready(self, thread, creator, category, initial_message):
+        """
+        Assigns new threads to the eligible supporter with the fewest active claims.
+        """
+        if not self.config.get("auto_assign_role") or thread.channel is None:
+            return
+        role = self.bot.modmail_guild.get_role(int(self.config["auto_assign_role"]))
+        if role is None:
+            return
+        members = [m for m in role.members if not m.bot]
+        online = [m for m in members if m.status is not discord.Status.offline]
+        # Without the presence intent everyone appears offline.
+        candidates = online or members
+        if not candidates:
+            return
+        member = min(candidates, key=lambda m: (self.claim_loads[str(m.id)], m.id))
+        channel_id = str(thread.channel.id)
+        new_claim = {
+            "main_claimer": str(member.id),
+            "claimed_at": utcnow(),
+            "claimers": [str(member.id)],
+        }
+        try:
+            result = await self.db.update_one({"channel_id": channel_id}, {"$setOnInsert": new_claim}, upsert=True)
+        except DuplicateKeyError:
+            return
+        if result.upserted_id is None:
+            return
+        self.cache.set(channel_id, {"_id": result.upserted_id, "channel_id": channel_id, **new_claim})
+        self.track_load(member.id, 1)
+        await self.invalidator.publish(channel_id)
+        await self.log_event("auto_assigned", channel_id, member=member.id)
+        embed = discord.Embed(
+            title="Thread assigned",
+            description=f"This thread was automatically assigned to {member.mention}.",
+            color=self.bot.main_color,
+        )
+        await thread.channel.send(embed=embed)
+
+    @tasks.loop(hours=6)
+    async def sweep_orphaned_claims(self):
+        """
+        Removes claims of channels that no longer exist in batches.
+        """
+        guild = self.bot.modmail_guild
+        if guild is None or guild.unavailable:
+            # Channels of an unavailable guild are missing from the cache but still exist.
+            return
+        orphaned = []
+        removed = 0
+        async for thread_data in self.db.find({"channel_id": {"$exists": True}}, {"channel_id": 1}):
+            if await self.channel_missing(int(thread_data["channel_id"])):
+                orphaned.append(thread_data["channel_id"])
+            if len(orphaned) >= 500:
+                removed += await self.remove_orphaned_claims(orphaned)
+                orphaned.clear()
+        if orphaned:
+            removed += await self.remove_orphaned_claims(orphaned)
+        if removed:
+            logger.info("Removed %s orphaned claims.", removed)
+
+    async def channel_missing(self, channel_id: int) -> bool:
+        if self.bot.get_channel(channel_id) is not None:
+            return False
+        try:
+            await self.bot.fetch_channel(channel_id)
+        except discord.NotFound:
+            return True
+        except discord.HTTPException:
+            pass
+        return False
+
+    async def remove_orphaned_claims(self, channel_ids: list) -> int:
+        """
+        Deletes the claims of a batch of channels, returns how many were removed.
+
+        Each claim is deleted atomically, so load counters are only decremented for claims
+        this sweep removed and not for ones removed concurrently by ``on_thread_close`` or another instance.
+        """
+        deleted = await asyncio.gather(*(self.db.find_one_and_delete({"channel_id": i}) for i in channel_ids))
+        removed = [thread_data for thread_data in deleted if thread_data]
+        for channel_id in channel_ids:
+            self.cache.drop(channel_id)
+        for thread_data in removed:
+            self.track_load(thread_data["main_claimer"], -1)
+        if removed:
+            removed_ids = [thread_data["channel_id"] for thread_data in removed]
+            await self.invalidator.publish(*removed_ids)
+            await self.log_event("swept", *removed_ids)
+        return len(removed)
+
+    @sweep_orphaned_claims.before_loop
+    async def before_sweep_orphaned_claims(self):
+        await self.bot.wait_until_ready()
+
     @commands.command(name="claim")
     @checks.has_permissions(PermissionLevel.SUPPORTER)
     @checks.thread_only()
@@ -92,16 +455,23 @@ class Claim(commands.Cog):
         """
         Claims thread on behalf of you.
         """
-        thread_data = await self.db.find_one({"channel_id": str(ctx.thread.channel.id)})
-        if thread_data is None:
-            await self.db.insert_one(
-                {
-                    "channel_id": str(ctx.thread.channel.id),
-                    "main_claimer": str(ctx.author.id),
-                    "claimed_at": utcnow(),
-                    "claimers": [str(ctx.author.id)],
-                }
-            )
+        channel_id = str(ctx.thread.channel.id)
+        new_claim = {
+            "main_claimer": str(ctx.author.id),
+            "claimed_at": utcnow(),
+            "claimers": [str(ctx.author.id)],
+        }
+        try:
+            result = await self.db.update_one({"channel_id": channel_id}, {"$setOnInsert": new_claim}, upsert=True)
+            upserted_id = result.upserted_id
+        except DuplicateKeyError:
+            # Another claim was inserted concurrently.
+            upserted_id = None
+        if upserted_id is not None:
+            self.cache.set(channel_id, {"_id": upserted_id, "channel_id": channel_id, **new_claim})
+            self.track_load(ctx.author.id, 1)
+            await self.invalidator.publish(channel_id)
+            await self.log_event("claimed", channel_id, actor=ctx.author.id)
             embed = discord.Embed(
                 title="Thread claimed",
                 description="You successfully claimed this thread.",
@@ -109,7 +479,10 @@ class Claim(commands.Cog):
             )
             return await ctx.send(embed=embed)
         else:
-            claimers_mentions = [f"<@{i}>" for i in thread_data["claimers"]]
+            thread_data = await self.db.find_one({"channel_id": channel_id})
+            self.cache.set(channel_id, thread_data)
+            claimers = thread_data["claimers"] if thread_data else []
+            claimers_mentions = [f"<@{i}>" for i in claimers]
             claimers_mentions_str = ", ".join(claimers_mentions)
             embed = discord.Embed(
                 title="Thread already claimed",
@@ -127,30 +500,38 @@ class Claim(commands.Cog):
 
         This allows all manually added members to reply in threads.
         """
-        thread_data = await self.db.find_one({"channel_id": str(ctx.thread.channel.id)})
+        channel_id = str(ctx.thread.channel.id)
+        thread_data = await self.db.find_one_and_update(
+            {"channel_id": channel_id, "main_claimer": str(ctx.author.id), "claimers": {"$ne": str(member.id)}},
+            {"$addToSet": {"claimers": str(member.id)}},
+            return_document=ReturnDocument.AFTER,
+        )
         if thread_data is None:
-            embed = discord.Embed(
-                title="Thread not claimed",
-                description=f"This thread is not claimed by anyone.",
-                color=ctx.bot.error_color,
-            )
-            return await ctx.send(embed=embed)
-        if not str(ctx.author.id) == thread_data["main_claimer"]:
-            embed = discord.Embed(
-                title="Thread not claimed by you.",
-                description=f"You have not claimed this thread. Ask <@{thread_data['main_claimer']}> to add you as claimer.",
-                color=ctx.bot.error_color,
-            )
+            # The update did not match, look up why.
+            thread_data = await self.db.find_one({"channel_id": channel_id})
+            self.cache.set(channel_id, thread_data)
+            if thread_data is None:
+                embed = discord.Embed(
+                    title="Thread not claimed",
+                    description=f"This thread is not claimed by anyone.",
+                    color=ctx.bot.error_color,
+                )
+            elif not str(ctx.author.id) == thread_data["main_claimer"]:
+                embed = discord.Embed(
+                    title="Thread not claimed by you.",
+                    description=f"You have not claimed this thread. Ask <@{thread_data['main_claimer']}> to add you as claimer.",
+                    color=ctx.bot.error_color,
+                )
+            else:
+                embed = discord.Embed(
+                    title="Member already added",
+                    description=f"The member {member.mention} is already added to the claimers.",
+                    color=ctx.bot.error_color,
+                )
             return await ctx.send(embed=embed)
-        if str(member.id) in thread_data["claimers"]:
-            embed = discord.Embed(
-                title="Member already added",
-                description=f"The member {member.mention} is already added to the claimers.",
-                color=ctx.bot.error_color,
-            )
-            return await ctx.send(embed=embed)
-        thread_data["claimers"].append(str(member.id))
-        await self.db.update_one({"channel_id": str(ctx.thread.channel.id)}, {"$set": thread_data})
+        self.cache.set(channel_id, thread_data)
+        await self.invalidator.publish(channel_id)
+        await self.log_event("added", channel_id, actor=ctx.author.id, member=member.id)
         embed = discord.Embed(
             title="Member added",
             description=f"You successfully added {member.mention} to the claimers.",
@@ -167,38 +548,46 @@ class Claim(commands.Cog):
 
         This removes an added member from the thread claimers. They can no longer reply.
         """
-        thread_data = await self.db.find_one({"channel_id": str(ctx.thread.channel.id)})
-        if thread_data is None:
-            embed = discord.Embed(
-                title="Thread not claimed",
-                description=f"This thread is not claimed by anyone.",
-                color=ctx.bot.error_color,
-            )
-            return await ctx.send(embed=embed)
-        if not str(ctx.author.id) == thread_data["main_claimer"]:
-            embed = discord.Embed(
-                title="Thread not claimed by you.",
-                description=f"You have not claimed this thread. Ask <@{thread_data['main_claimer']}> remove you from the claimers.",
-                color=ctx.bot.error_color,
-            )
-            return await ctx.send(embed=embed)
-
-        if not str(member.id) in thread_data["claimers"]:
-            embed = discord.Embed(
-                title="Member not added",
-                description=f"The member {member.mention} is not added to the claimers.",
-                color=ctx.bot.error_color,
-            )
-            return await ctx.send(embed=embed)
-        if str(member.id) == str(ctx.author.id):
-            embed = discord.Embed(
-                title="You cannot remove yourself",
-                description=f"You cannot remove yourself from the claimers. Unclaim the thread instead.",
-                color=ctx.bot.error_color,
+        channel_id = str(ctx.thread.channel.id)
+        thread_data = None
+        if not member.id == ctx.author.id:
+            thread_data = await self.db.find_one_and_update(
+                {"channel_id": channel_id, "main_claimer": str(ctx.author.id), "claimers": str(member.id)},
+                {"$pull": {"claimers": str(member.id)}},
+                return_document=ReturnDocument.AFTER,
             )
+        if thread_data is None:
+            # The update did not match, look up why.
+            thread_data = await self.db.find_one({"channel_id": channel_id})
+            self.cache.set(channel_id, thread_data)
+            if thread_data is None:
+                embed = discord.Embed(
+                    title="Thread not claimed",
+                    description=f"This thread is not claimed by anyone.",
+                    color=ctx.bot.error_color,
+                )
+            elif not str(ctx.author.id) == thread_data["main_claimer"]:
+                embed = discord.Embed(
+                    title="Thread not claimed by you.",
+                    description=f"You have not claimed this thread. Ask <@{thread_data['main_claimer']}> remove you from the claimers.",
+                    color=ctx.bot.error_color,
+                )
+            elif not str(member.id) in thread_data["claimers"]:
+                embed = discord.Embed(
+                    title="Member not added",
+                    description=f"The member {member.mention} is not added to the claimers.",
+                    color=ctx.bot.error_color,
+                )
+            else:
+                embed = discord.Embed(
+                    title="You cannot remove yourself",
+                    description=f"You cannot remove yourself from the claimers. Unclaim the thread instead.",
+                    color=ctx.bot.error_color,
+                )
             return await ctx.send(embed=embed)
-        thread_data["claimers"].remove(str(member.id))
-        await self.db.update_one({"channel_id": str(ctx.thread.channel.id)}, {"$set": thread_data})
+        self.cache.set(channel_id, thread_data)
+        await self.invalidator.publish(channel_id)
+        await self.log_event("removed", channel_id, actor=ctx.author.id, member=member.id)
         embed = discord.Embed(
             title="Member removed",
             description=f"You successfully removed {member.mention} from the claimers.",
@@ -213,22 +602,29 @@ class Claim(commands.Cog):
         """
         Unclaims a thread if claimed by yourself.
         """
-        thread_data = await self.db.find_one({"channel_id": str(ctx.thread.channel.id)})
+        channel_id = str(ctx.thread.channel.id)
+        thread_data = await self.db.find_one_and_delete({"channel_id": channel_id, "main_claimer": str(ctx.author.id)})
         if thread_data is None:
-            embed = discord.Embed(
-                title="Thread not claimed",
-                description=f"This thread is not claimed by anyone.",
-                color=ctx.bot.error_color,
-            )
+            # The delete did not match, look up why.
+            thread_data = await self.db.find_one({"channel_id": channel_id})
+            self.cache.set(channel_id, thread_data)
+            if thread_data is None:
+                embed = discord.Embed(
+                    title="Thread not claimed",
+                    description=f"This thread is not claimed by anyone.",
+                    color=ctx.bot.error_color,
+                )
+            else:
+                embed = discord.Embed(
+                    title="Thread not claimed by you.",
+                    description=f"You have not claimed this thread. Ask the claimer <@{thread_data['main_claimer']}> to unclaim it.",
+                    color=ctx.bot.error_color,
+                )
             return await ctx.send(embed=embed)
-        if not str(ctx.author.id) == thread_data["main_claimer"]:
-            embed = discord.Embed(
-                title="Thread not claimed by you.",
-                description=f"You have not claimed this thread. Ask the claimer <@{thread_data['main_claimer']}> to unclaim it.",
-                color=ctx.bot.error_color,
-            )
-            return await ctx.send(embed=embed)
-        await self.db.delete_one({"channel_id": str(ctx.thread.channel.id)})
+        self.cache.set(channel_id, None)
+        self.track_load(ctx.author.id, -1)
+        await self.invalidator.publish(channel_id)
+        await self.log_event("unclaimed", channel_id, actor=ctx.author.id)
         embed = discord.Embed(
             title="Thread unclaimed",
             description="You successfully unclaimed this thread.",
@@ -246,23 +642,32 @@ class Claim(commands.Cog):
         Allowes moderators to force addclaim a thread. It does not check anything regarding thread claimer.
         You can overwrite the permissions via the ``perms override`` commmand if needed.
         """
-        thread_data = await self.db.find_one({"channel_id": str(ctx.thread.channel.id)})
+        channel_id = str(ctx.thread.channel.id)
+        thread_data = await self.db.find_one_and_update(
+            {"channel_id": channel_id, "claimers": {"$ne": str(member.id)}},
+            {"$addToSet": {"claimers": str(member.id)}},
+            return_document=ReturnDocument.AFTER,
+        )
         if thread_data is None:
-            embed = discord.Embed(
-                title="Thread not claimed",
-                description=f"This thread is not claimed by anyone.",
-                color=ctx.bot.error_color,
-            )
+            # The update did not match, look up why.
+            thread_data = await self.db.find_one({"channel_id": channel_id})
+            self.cache.set(channel_id, thread_data)
+            if thread_data is None:
+                embed = discord.Embed(
+                    title="Thread not claimed",
+                    description=f"This thread is not claimed by anyone.",
+                    color=ctx.bot.error_color,
+                )
+            else:
+                embed = discord.Embed(
+                    title="Member already added",
+                    description=f"The member {member.mention} is already added to the claimers.",
+                    color=ctx.bot.error_color,
+                )
             return await ctx.send(embed=embed)
-        if str(member.id) in thread_data["claimers"]:
-            embed = discord.Embed(
-                title="Member already added",
-                description=f"The member {member.mention} is already added to the claimers.",
-                color=ctx.bot.error_color,
-            )
-            return await ctx.send(embed=embed)
-        thread_data["claimers"].append(str(member.id))
-        await self.db.update_one({"channel_id": str(ctx.thread.channel.id)}, {"$set": thread_data})
+        self.cache.set(channel_id, thread_data)
+        await self.invalidator.publish(channel_id)
+        await self.log_event("force_added", channel_id, actor=ctx.author.id, member=member.id)
         embed = discord.Embed(
             title="Member added",
             description=f"You successfully added {member.mention} to the claimers.",
@@ -280,30 +685,40 @@ class Claim(commands.Cog):
         Allowes moderators to force removeclaim a thread. It does not check anything regarding thread claimer.
         You can overwrite the permissions via the ``perms override`` commmand if needed.
         """
-        thread_data = await self.db.find_one({"channel_id": str(ctx.thread.channel.id)})
-        if thread_data is None:
-            embed = discord.Embed(
-                title="Thread not claimed",
-                description=f"This thread is not claimed by anyone.",
-                color=ctx.bot.error_color,
-            )
-            return await ctx.send(embed=embed)
-        if not str(member.id) in thread_data["claimers"]:
-            embed = discord.Embed(
-                title="Member not added",
-                description=f"The member {member.mention} is not added to the claimers.",
-                color=ctx.bot.error_color,
-            )
-            return await ctx.send(embed=embed)
-        if str(member.id) == str(ctx.author.id):
-            embed = discord.Embed(
-                title="You cannot remove yourself",
-                description=f"You cannot remove yourself from the claimers. Unclaim the thread instead.",
-                color=ctx.bot.error_color,
+        channel_id = str(ctx.thread.channel.id)
+        thread_data = None
+        if not member.id == ctx.author.id:
+            thread_data = await self.db.find_one_and_update(
+                {"channel_id": channel_id, "claimers": str(member.id)},
+                {"$pull": {"claimers": str(member.id)}},
+                return_document=ReturnDocument.AFTER,
             )
+        if thread_data is None:
+            # The update did not match, look up why.
+            thread_data = await self.db.find_one({"channel_id": channel_id})
+            self.cache.set(channel_id, thread_data)
+            if thread_data is None:
+                embed = discord.Embed(
+                    title="Thread not claimed",
+                    description=f"This thread is not claimed by anyone.",
+                    color=ctx.bot.error_color,
+                )
+            elif not str(member.id) in thread_data["claimers"]:
+                embed = discord.Embed(
+                    title="Member not added",
+                    description=f"The member {member.mention} is not added to the claimers.",
+                    color=ctx.bot.error_color,
+                )
+            else:
+                embed = discord.Embed(
+                    title="You cannot remove yourself",
+                    description=f"You cannot remove yourself from the claimers. Unclaim the thread instead.",
+                    color=ctx.bot.error_color,
+                )
             return await ctx.send(embed=embed)
-        thread_data["claimers"].remove(str(member.id))
-        await self.db.update_one({"channel_id": str(ctx.thread.channel.id)}, {"$set": thread_data})
+        self.cache.set(channel_id, thread_data)
+        await self.invalidator.publish(channel_id)
+        await self.log_event("force_removed", channel_id, actor=ctx.author.id, member=member.id)
         embed = discord.Embed(
             title="Member removed",
             description=f"You successfully removed {member.mention} from the claimers.",
@@ -321,7 +736,9 @@ class Claim(commands.Cog):
         Allowes moderators to force unclaim a thread. It does not check anything regarding thread claimer.
         You can overwrite the permissions via the ``perms override`` commmand if needed.
         """
-        thread_data = await self.db.find_one({"channel_id": str(ctx.thread.channel.id)})
+        channel_id = str(ctx.thread.channel.id)
+        thread_data = await self.db.find_one_and_delete({"channel_id": channel_id})
+        self.cache.set(channel_id, None)
         if thread_data is None:
             embed = discord.Embed(
                 title="Thread not claimed",
@@ -329,7 +746,9 @@ class Claim(commands.Cog):
                 color=ctx.bot.error_color,
             )
             return await ctx.send(embed=embed)
-        await self.db.delete_one({"channel_id": str(ctx.thread.channel.id)})
+        self.track_load(thread_data["main_claimer"], -1)
+        await self.invalidator.publish(channel_id)
+        await self.log_event("force_unclaimed", channel_id, actor=ctx.author.id)
         embed = discord.Embed(
             title="Thread unclaimed",
             description="You successfully forced unclaim of this thread.",
@@ -337,6 +756,149 @@ class Claim(commands.Cog):
         )
         return await ctx.send(embed=embed)
 
+    @commands.command(name="myclaims")
+    @checks.has_permissions(PermissionLevel.SUPPORTER)
+    async def myclaims(self, ctx: commands.Context):
+        """
+        Lists the threads you have claimed or were added to.
+        """
+        member_id = str(ctx.author.id)
+        pipeline = [
+            {"$match": {"claimers": member_id}},
+            {
+                "$facet": {
+                    "summary": [
+                        {
+                            "$group": {
+                                "_id": None,
+                                "total": {"$sum": 1},
+                                "main": {"$sum": {"$cond": [{"$eq": ["$main_claimer", member_id]}, 1, 0]}},
+                                "oldest": {"$min": "$claimed_at"},
+                            }
+                        }
+                    ],
+                    "threads": [
+                        {"$sort": {"claimed_at": 1}},
+                        {"$limit": 20},
+                        {"$project": {"_id": 0, "channel_id": 1, "main_claimer": 1, "claimed_at": 1}},
+                    ],
+                }
+            },
+        ]
+        result = (await self.db.aggregate(pipeline).to_list(None))[0]
+        if not result["summary"]:
+            embed = discord.Embed(
+                title="No claimed threads",
+                description="You have not claimed any threads.",
+                color=ctx.bot.error_color,
+            )
+            return await ctx.send(embed=embed)
+        summary = result["summary"][0]
+        threads = []
+        for thread_data in result["threads"]:
+            role = "main claimer" if thread_data["main_claimer"] == member_id else "added"
+            threads.append(
+                f"<#{thread_data['channel_id']}> - {role}, claimed {format_dt(as_utc(thread_data['claimed_at']), 'R')}"
+            )
+        if summary["total"] > len(threads):
+            threads.append(f"... and {summary['total'] - len(threads)} more")
+        embed = discord.Embed(
+            title="Your claimed threads",
+            description="\n".join(threads),
+            color=ctx.bot.main_color,
+        )
+        embed.add_field(name="Claimed threads", value=str(summary["total"]))
+        embed.add_field(name="Main claimer of", value=str(summary["main"]))
+        embed.add_field(name="Oldest claim", value=format_dt(as_utc(summary["oldest"]), "R"))
+        await ctx.send(embed=embed)
+
+    @commands.command(name="claimstats")
+    @checks.has_permissions(PermissionLevel.MODERATOR)
+    async def claimstats(self, ctx: commands.Context):
+        """
+        Shows the current claim workload per member.
+        """
+        pipeline = [
+            {"$match": {"claimers": {"$exists": True}}},
+            {"$unwind": "$claimers"},
+            {
+                "$group": {
+                    "_id": "$claimers",
+                    "total": {"$sum": 1},
+                    "main": {"$sum": {"$cond": [{"$eq": ["$claimers", "$main_claimer"]}, 1, 0]}},
+                    "oldest": {"$min": "$claimed_at"},
+                }
+            },
+            {"$sort": {"total": -1, "_id": 1}},
+        ]
+        stats = await self.db.aggregate(pipeline).to_list(None)
+        if not stats:
+            embed = discord.Embed(
+                title="No claimed threads",
+                description="There are no claimed threads.",
+                color=ctx.bot.error_color,
+            )
+            return await ctx.send(embed=embed)
+        embeds = []
+        for i in range(0, len(stats), 15):
+            lines = [
+                f"<@{s['_id']}>: **{s['total']}** threads ({s['main']} as main claimer), oldest {format_dt(as_utc(s['oldest']), 'R')}"
+                for s in stats[i : i + 15]
+            ]
+            embed = discord.Embed(
+                title="Claim statistics",
+                description="\n".join(lines),
+                color=ctx.bot.main_color,
+            )
+            embed.set_footer(text=f"{len(stats)} members with claims")
+            embeds.append(embed)
+        session = EmbedPaginatorSession(ctx, *embeds)
+        await session.run()
+
+    @commands.command(name="claimexport")
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    @commands.max_concurrency(number=1, per=commands.BucketType.guild, wait=False)
+    async def claimexport(self, ctx: commands.Context, days: int = 30, file_format: Literal["csv", "jsonl"] = "csv"):
+        """
+        Exports the claim event log of the last days as an attachment.
+
+        **Usage:**
+        {prefix}claimexport
+        {prefix}claimexport 90 jsonl
+        """
+        query = {"t": {"$gte": utcnow() - timedelta(days=days)}}
+        count = 0
+        with tempfile.TemporaryFile() as file:
+            # Events are written while paging through the cursor, nothing is kept in memory.
+            writer = io.TextIOWrapper(file, encoding="utf-8", newline="")
+            csv_writer = csv.writer(writer)
+            if file_format == "csv":
+                csv_writer.writerow(["time", "action", "channel_id", "by", "member"])
+            async for event in self.events.find(query, {"_id": 0}).sort("t", 1).batch_size(1000):
+                time = as_utc(event["t"]).isoformat()
+                if file_format == "csv":
+                    csv_writer.writerow([time, event["a"], event["c"], event.get("by", ""), event.get("m", "")])
+                else:
+                    writer.write(json.dumps({**event, "t": time}) + "\n")
+                count += 1
+            writer.flush()
+            writer.detach()
+            size = file.tell()
+            if size > ctx.guild.filesize_limit:
+                embed = discord.Embed(
+                    title="Export too large",
+                    description=f"The export of {count} events is too large to upload. Export fewer days.",
+                    color=ctx.bot.error_color,
+                )
+                return await ctx.send(embed=embed)
+            file.seek(0)
+            embed = discord.Embed(
+                title="Claim events exported",
+                description=f"Exported {count} events of the last {days} days.",
+                color=ctx.bot.main_color,
+            )
+            await ctx.send(embed=embed, file=discord.File(file, filename=f"claim-events.{file_format}"))
+
     @commands.group(name="claimconfig", invoke_without_command=True)
     @checks.has_permissions(PermissionLevel.OWNER)
     async def claimconfig(self, ctx: commands.Context):
@@ -347,6 +909,31 @@ class Claim(commands.Cog):
         """
         await ctx.send_help(ctx.command)
 
+    @claimconfig.command(name="autoassign")
+    @checks.has_permissions(PermissionLevel.OWNER)
+    async def claimconfig_autoassign(self, ctx: commands.Context, *, role: Union[discord.Role, str]):
+        """
+        Automatically assigns new threads to members of a role.
+
+        The online member with the fewest active claims becomes the main claimer.
+        Use ``off`` instead of a role to disable it.
+        """
+        if isinstance(role, str):
+            if role.lower() != "off":
+                raise commands.BadArgument(f'Role "{role}" not found.')
+            self.config["auto_assign_role"] = None
+            description = "New threads are no longer assigned automatically."
+        else:
+            self.config["auto_assign_role"] = str(role.id)
+            description = f"New threads are now automatically assigned to members of {role.mention}."
+        await self.update_config()
+        embed = discord.Embed(
+            title="Auto assignment updated",
+            description=description,
+            color=ctx.bot.main_color,
+        )
+        await ctx.send(embed=embed)
+
 
 async def setup(bot: ModmailBot):
     await bot.add_cog(Claim(bot))
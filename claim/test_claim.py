@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("core")
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from claim import ClaimCache, ClaimInvalidator
+
+
+def make_invalidator(db):
+    return ClaimInvalidator(db, ClaimCache(), poll_interval=0)
+
+
+def test_polling_drops_changed_claims():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["plugins"]["Claim"]
+        first, second = make_invalidator(db), make_invalidator(db)
+        await first.start()
+        await second.start()
+        first.stop()
+        second.stop()
+        second.cache.set(1, {"channel_id": "1"})
+        second.cache.set(2, {"channel_id": "2"})
+
+        await first.publish(1)
+        await second.poll_once()
+        assert 1 not in second.cache
+        assert 2 in second.cache
+        assert second.version == 1
+
+        # More changes than the history keeps, the whole cache is dropped.
+        first.history = 2
+        await first.publish(3, 4, 5)
+        await second.poll_once()
+        assert len(second.cache) == 0
+
+    asyncio.run(scenario())
+
+
+def test_polling_survives_errors():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["plugins"]["Claim"]
+        invalidator = make_invalidator(db)
+        invalidator.cache.set(1, {"channel_id": "1"})
+        calls = 0
+
+        async def failing_find_one(query):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                raise ConnectionError("database unavailable")
+            if calls > 2:
+                await asyncio.Event().wait()
+
+        invalidator.db = type("Collection", (), {"find_one": staticmethod(failing_find_one)})()
+        task = asyncio.create_task(invalidator.poll())
+        while calls < 3:
+            await asyncio.sleep(0)
+        assert not task.done()
+        assert len(invalidator.cache) == 0
+        task.cancel()
+
+    asyncio.run(scenario())
@@ -1,16 +1,307 @@
 from collections import defaultdict
+from contextlib import suppress
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Union
+import asyncio
+import heapq
 import os
+import re
+import socket
+import uuid
 
+import aiohttp
+import croniter
 import discord
 from discord.ext import commands, tasks
 from discord import utils
+from pymongo import DeleteOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 from core import checks
-from core.models import PermissionLevel
+from core.models import PermissionLevel, getLogger
 from core.time import UserFriendlyTime
-from core.paginator import EmbedPaginatorSession, MessagePaginatorSession
+from core.paginator import MessagePaginatorSession
+
+logger = getLogger(__name__)
+
+SCHEMA_VERSION = 2
+MAX_DELIVERY_ATTEMPTS = 8
+RETRY_BASE_DELAY = 5
+RETRY_MAX_DELAY = 3600
+LEASE_TTL = 15
+REMINDERS_PER_PAGE = 5
+MIN_RECURRENCE_INTERVAL = 60
+# Discord allows up to 10 embeds per message with 6000 characters in total.
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBEDS_LENGTH = 6000
+INTERVAL_REGEX = re.compile(r'^(?:(?P<weeks>\d+)w)?(?:(?P<days>\d+)d)?(?:(?P<hours>\d+)h)?(?:(?P<minutes>\d+)m)?(?:(?P<seconds>\d+)s)?$')
+
+
+def reminder_key(user_id, reminder_id):
+    return f'{user_id}-{reminder_id}'
+
+
+def retry_delay(error: Exception, attempts: int):
+    """
+    Returns the seconds to wait before retrying a failed delivery,
+    or ``None`` if the error is permanent and the delivery should be dropped.
+    """
+    retry_after = 0
+    if isinstance(error, discord.RateLimited):
+        retry_after = error.retry_after
+    elif isinstance(error, discord.HTTPException):
+        if error.status == 429:
+            with suppress(AttributeError, TypeError, ValueError):
+                retry_after = float(error.response.headers.get('Retry-After'))
+        elif not isinstance(error, discord.DiscordServerError):
+            return None
+    elif not isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError, OSError)):
+        return None
+    if attempts >= MAX_DELIVERY_ATTEMPTS:
+        return None
+    return max(retry_after, min(RETRY_BASE_DELAY * 2 ** attempts, RETRY_MAX_DELAY))
+
+
+def chunk_reminders(reminders: list, chunk_size: int):
+    """
+    Splits the reminders of one destination into messages of up to ``chunk_size`` embeds
+    without exceeding the total embed length of a message.
+    """
+    chunks = []
+    length = 0
+    for reminder in reminders:
+        size = len('Reminder') + len(reminder["text"])
+        if not chunks or len(chunks[-1]) >= chunk_size or length + size > MAX_EMBEDS_LENGTH:
+            chunks.append([])
+            length = 0
+        chunks[-1].append(reminder)
+        length += size
+    return chunks
+
+
+def parse_recurrence(schedule: str):
+    """
+    Parses an interval like ``1d12h`` or a cron expression like ``0 9 * * 1-5``.
+
+    Returns the recurrence to store on the reminder or ``None`` if the schedule is invalid.
+    """
+    match = INTERVAL_REGEX.match(schedule.strip().lower())
+    if match and any(match.groupdict().values()):
+        seconds = timedelta(**{k: int(v) for k, v in match.groupdict().items() if v}).total_seconds()
+        if seconds < MIN_RECURRENCE_INTERVAL:
+            return None
+        return {"interval": int(seconds)}
+    # Only the standard five fields are accepted, a sixth seconds field could fire every second.
+    if len(schedule.split()) == 5 and croniter.croniter.is_valid(schedule):
+        return {"cron": schedule}
+    return None
+
+
+def next_occurrence(recurrence: dict, last: datetime, now: datetime):
+    """
+    Computes the first occurrence after ``now``, occurrences missed while the bot was offline are skipped.
+    """
+    if "interval" in recurrence:
+        interval = timedelta(seconds=recurrence["interval"])
+        if last > now:
+            return last
+        return last + interval * ((now - last) // interval + 1)
+    return croniter.croniter(recurrence["cron"], now).get_next(datetime)
+
+
+def format_recurrence(recurrence: dict):
+    if "interval" in recurrence:
+        return f'every {timedelta(seconds=recurrence["interval"])}'
+    return f'``{recurrence["cron"]}``'
+
+
+class ReminderQueue:
+    """
+    Min-heap of pending reminders keyed by their due time.
+
+    Entries are ``(end, reminder_key)`` tuples, pushing an entry already queued is a no-op.
+    Deleted reminders are removed lazily: stale entries are skipped by the consumer when they are popped.
+    """
+    def __init__(self):
+        self._heap = []
+        self._entries = set()
+        self._wakeup = asyncio.Event()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def load(self, entries):
+        self._entries = set(entries)
+        self._heap = list(self._entries)
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    def push(self, end: datetime, key: str):
+        entry = (end, key)
+        if entry in self._entries:
+            return
+        self._entries.add(entry)
+        heapq.heappush(self._heap, entry)
+        if self._heap[0] is entry:
+            self._wakeup.set()
+
+    def discard(self, key: str):
+        if self._heap and self._heap[0][1] == key:
+            self._entries.discard(heapq.heappop(self._heap))
+            self._wakeup.set()
+
+    def peek(self):
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            self._entries.discard(entry)
+            due.append(entry)
+        return due
+
+    async def wait(self):
+        """Sleeps until the head of the queue is due or the head changes."""
+        self._wakeup.clear()
+        timeout = None
+        if self._heap:
+            timeout = max((self._heap[0][0] - datetime.now()).total_seconds(), 0)
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+
+
+class DeliveryLease:
+    """
+    Heartbeat based leader lease stored in the plugin partition.
+
+    Only the instance holding the lease delivers reminders. The holder renews it
+    every few seconds, once it expires any other instance can take it over.
+    Only ``find_one_and_update`` and ``delete_one`` are used on the collection,
+    so an in-memory stand-in like mongomock-motor can be passed for testing.
+    """
+    def __init__(self, db, holder: str, ttl: int = LEASE_TTL, clock=utils.utcnow):
+        self.db = db
+        self.holder = holder
+        self.ttl = ttl
+        self.clock = clock
+        self.expires_at = None
+        self.elected = asyncio.Event()
+
+    @property
+    def is_leader(self):
+        return self.expires_at is not None and self.clock() < self.expires_at
+
+    async def acquire(self):
+        """Acquires or renews the lease, returns whether this instance is the leader."""
+        now = self.clock()
+        expires_at = now + timedelta(seconds=self.ttl)
+        try:
+            await self.db.find_one_and_update(
+                {"_id": "delivery_lease", "$or": [{"holder": self.holder}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"holder": self.holder, "expires_at": expires_at}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # The lease document exists and is held by another instance.
+            self.expires_at = None
+            self.elected.clear()
+            return False
+        self.expires_at = expires_at
+        self.elected.set()
+        return True
+
+    async def release(self):
+        self.expires_at = None
+        self.elected.clear()
+        await self.db.delete_one({"_id": "delivery_lease", "holder": self.holder})
+
+
+class ReminderFilters(commands.FlagConverter, prefix='--', delimiter=' '):
+    before: Optional[str] = None
+    after: Optional[str] = None
+    channel: Optional[Union[discord.TextChannel, discord.VoiceChannel, discord.Thread, discord.ForumChannel]] = None
+    keyword: Optional[str] = None
+
+
+class ReminderListView(discord.ui.View):
+    """
+    Paginates the reminders of a user, each page is queried when it is shown.
+
+    Pages are fetched with keyset pagination on ``(end, _id)`` so the ``(user_id, end)``
+    index serves every page no matter how far the user has paged.
+    """
+    def __init__(self, cog, ctx: commands.Context, query: dict, total: int):
+        super().__init__(timeout=180)
+        self.cog = cog
+        self.ctx = ctx
+        self.query = query
+        self.total = total
+        self.cursors = [None]
+        self.page = 0
+        self.has_next = False
+        self.message = None
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        return interaction.user.id == self.ctx.author.id
+
+    async def on_timeout(self):
+        if self.message:
+            with suppress(discord.HTTPException):
+                await self.message.edit(view=None)
+
+    async def fetch_page(self):
+        query = self.query
+        cursor = self.cursors[self.page]
+        if cursor:
+            end, key = cursor
+            query = {"$and": [query, {"$or": [{"end": {"$gt": end}}, {"end": end, "_id": {"$gt": key}}]}]}
+        docs = await self.cog.db.find(query).sort([("end", 1), ("_id", 1)]).limit(REMINDERS_PER_PAGE + 1).to_list(None)
+        self.has_next = len(docs) > REMINDERS_PER_PAGE
+        docs = docs[:REMINDERS_PER_PAGE]
+        if self.has_next and len(self.cursors) == self.page + 1:
+            self.cursors.append((docs[-1]["end"], docs[-1]["_id"]))
+        return docs
+
+    async def render(self):
+        docs = await self.fetch_page()
+        pages = max((self.total + REMINDERS_PER_PAGE - 1) // REMINDERS_PER_PAGE, 1)
+        embed = discord.Embed(title='Your Reminders', color=self.cog.bot.main_color)
+        for value in docs:
+            remind_location = "Direct Message"
+            if not value["channel_id"] == None:
+                remind_location = f'<#{value["channel_id"]}>'
+            timestamp = utils.format_dt(value["end"], "F")
+            text = utils.escape_markdown(value["text"])
+            if len(text) > 800:
+                text = text[:800] + '...'
+            description = f'Reminding at: {timestamp}\nReminding in: {remind_location}\nReminder Text: {text}'
+            if value.get("recurrence"):
+                description += f'\nRepeating: {format_recurrence(value["recurrence"])}'
+            embed.add_field(name=f'ID: {value["reminder_id"]}', value=description, inline=False)
+        embed.set_footer(text=f'Page {self.page + 1}/{pages} - {self.total} reminders')
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = not self.has_next
+        return embed
+
+    async def start(self):
+        embed = await self.render()
+        self.message = await self.ctx.send(embed=embed, view=self)
+
+    @discord.ui.button(label='Previous', style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        await interaction.response.edit_message(embed=await self.render(), view=self)
+
+    @discord.ui.button(label='Next', style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await interaction.response.edit_message(embed=await self.render(), view=self)
+
+    @discord.ui.button(label='Close', style=discord.ButtonStyle.danger)
+    async def close(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.stop()
+        await interaction.response.edit_message(view=None)
 
 
 class Reminder(commands.Cog):
@@ -19,13 +310,19 @@ class Reminder(commands.Cog):
         self.bot = bot
         self.db = self.bot.plugin_db.get_partition(self)
         self.config = None
-        self.default_config = {}
-        
+        self.default_config = {"schema_version": SCHEMA_VERSION, "delivery_concurrency": 10, "coalesce_window": 0}
+        self.queue = ReminderQueue()
+        self.scheduler = None
+        self.lease = DeliveryLease(self.db, f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}')
+        self.queue_loaded = False
+
     async def cog_load(self):
         self.config = await self.db.find_one({"_id": "reminder"})
         if self.config is None:
             self.config = self.default_config
             await self.update_config()
+        elif self.config.get("schema_version", 1) < SCHEMA_VERSION:
+            await self.migrate_config()
         missing = []
         for key in self.default_config.keys():
             if key not in self.config:
@@ -34,10 +331,58 @@ class Reminder(commands.Cog):
             for key in missing:
                 self.config[key] = self.default_config[key]
         await self.update_config()
-        self.reminder_task.start()
-    
+        await self.db.create_index("end", sparse=True)
+        await self.db.create_index([("user_id", 1), ("end", 1)], sparse=True)
+        self.lease_heartbeat.start()
+        self.scheduler = self.bot.loop.create_task(self.reminder_task())
+
     async def cog_unload(self):
-        self.reminder_task.stop()
+        self.lease_heartbeat.cancel()
+        if self.scheduler:
+            self.scheduler.cancel()
+        if self.lease.is_leader:
+            await self.lease.release()
+
+    async def load_queue(self):
+        # Reminders left in the outbox by a crashed leader are picked up again.
+        await self.db.update_many({"state": "delivering"}, {"$set": {"state": "pending"}})
+        entries = []
+        async for doc in self.db.find({"end": {"$exists": True}}, {"end": 1, "retry_at": 1}):
+            entries.append((doc.get("retry_at") or doc["end"], doc["_id"]))
+        self.queue.load(entries)
+
+    async def load_upcoming(self):
+        """
+        Queues the reminders coming due soon, including ones created on other instances.
+        """
+        horizon = datetime.now() + timedelta(seconds=LEASE_TTL)
+        query = {"end": {"$lte": horizon}, "state": {"$ne": "delivering"}}
+        async for doc in self.db.find(query, {"end": 1, "retry_at": 1}):
+            self.queue.push(doc.get("retry_at") or doc["end"], doc["_id"])
+
+    @tasks.loop(seconds=LEASE_TTL / 3)
+    async def lease_heartbeat(self):
+        was_leader = self.lease.is_leader
+        try:
+            is_leader = await self.lease.acquire()
+        except Exception:
+            logger.exception('Error renewing the reminder delivery lease')
+            return
+        if is_leader and not was_leader:
+            logger.info('Acquired the reminder delivery lease as %s', self.lease.holder)
+            self.queue_loaded = False
+        elif was_leader and not is_leader:
+            logger.warning('Lost the reminder delivery lease to another instance')
+        if not is_leader:
+            return
+        try:
+            if self.queue_loaded:
+                await self.load_upcoming()
+            else:
+                await self.load_queue()
+                self.queue_loaded = True
+        except Exception:
+            logger.exception('Error loading the reminder queue')
 
     async def update_config(self):
         await self.db.find_one_and_update(
@@ -45,128 +390,304 @@ class Reminder(commands.Cog):
             {"$set": self.config},
             upsert=True,
         )
-        
-    async def get_insert_userdata(self, ctx: commands.Context):
-        current_userdata = self.config.get(str(ctx.author.id), None)
-        userdata = {}
-        if not current_userdata:
-            reminder_id = 1
-            userdata["reminder_id"] = reminder_id
-            userdata["reminders"] = {}
-            self.config[str(ctx.author.id)] = userdata
-            await self.update_config()
-            return reminder_id
-        else:
-            new_reminder_id = current_userdata["reminder_id"] + 1
-            self.config[str(ctx.author.id)]["reminder_id"] = new_reminder_id
-            await self.update_config()
-            return new_reminder_id
 
-    @checks.has_permissions(PermissionLevel.REGULAR)
-    @commands.command(name='remind', aliases=['remindme'])
-    async def remind(self, ctx: commands.Context, duration: str, channel: Optional[Union[discord.TextChannel, discord.VoiceChannel, discord.Thread, discord.ForumChannel]] = None, *, text: str):
-        """Create a reminder"""
+    async def migrate_config(self):
+        """
+        Moves the reminders stored in the single config document into one document per reminder.
+        """
+        reminders = []
+        counters = []
+        settings = {}
+        for key, value in self.config.items():
+            if not isinstance(value, dict) or 'reminders' not in value:
+                settings[key] = value
+                continue
+            counters.append(UpdateOne(
+                {"_id": f'counter-{key}'},
+                {"$max": {"reminder_id": value["reminder_id"]}},
+                upsert=True,
+            ))
+            for k, v in value['reminders'].items():
+                reminders.append({
+                    "_id": reminder_key(key, k),
+                    "user_id": str(key),
+                    "reminder_id": int(k),
+                    "end": v["end"],
+                    "channel_id": v["channel_id"],
+                    "text": v["text"],
+                })
+        if reminders:
+            # Documents inserted by an interrupted earlier migration are kept as they are.
+            with suppress(BulkWriteError):
+                await self.db.insert_many(reminders, ordered=False)
+        if counters:
+            await self.db.bulk_write(counters, ordered=False)
+        settings["schema_version"] = SCHEMA_VERSION
+        await self.db.replace_one({"_id": "reminder"}, settings, upsert=True)
+        self.config = settings
+        logger.info('Migrated %s reminders of %s users to the per-reminder storage.', len(reminders), len(counters))
+
+    async def next_reminder_id(self, user_id: int):
+        counter = await self.db.find_one_and_update(
+            {"_id": f'counter-{user_id}'},
+            {"$inc": {"reminder_id": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return counter["reminder_id"]
+
+    async def create_reminder(self, ctx: commands.Context, end: datetime, channel, text: str, recurrence: dict = None):
         channel_option = None
         notify_txt = "Direct Message"
         if channel:
             channel_option = channel.id
             notify_txt = f"<#{channel.id}>"
-        timeconverter = UserFriendlyTime()
-        dt = await timeconverter.convert(ctx=ctx, argument=duration, now=datetime.now())
-        reminder_id = await self.get_insert_userdata(ctx)
-        
-        reminder_data = {"end": dt.dt, "channel_id": channel_option, "text": text}
-        self.config[str(ctx.author.id)]["reminders"][str(reminder_id)] = reminder_data
-        await self.update_config()
-        timestamp = utils.format_dt(dt.dt, 'F')
-        embed = discord.Embed(title='Reminder created', description=f'Your reminder has been created successfully!\nReminding at: {timestamp}\nReminding in: {notify_txt}', color=discord.Color.green())
+        reminder_id = await self.next_reminder_id(ctx.author.id)
+
+        key = reminder_key(ctx.author.id, reminder_id)
+        reminder_data = {"_id": key, "user_id": str(ctx.author.id), "reminder_id": reminder_id, "end": end, "channel_id": channel_option, "text": text}
+        if recurrence:
+            reminder_data["recurrence"] = recurrence
+        await self.db.insert_one(reminder_data)
+        self.queue.push(end, key)
+        timestamp = utils.format_dt(end, 'F')
+        description = f'Your reminder has been created successfully!\nReminding at: {timestamp}\nReminding in: {notify_txt}'
+        if recurrence:
+            description += f'\nRepeating: {format_recurrence(recurrence)}'
+        embed = discord.Embed(title='Reminder created', description=description, color=discord.Color.green())
         embed.set_footer(text=f'Reminder ID: {reminder_id}')
         await ctx.send(embed=embed)
-    
+
+    @checks.has_permissions(PermissionLevel.REGULAR)
+    @commands.command(name='remind', aliases=['remindme'])
+    async def remind(self, ctx: commands.Context, duration: str, channel: Optional[Union[discord.TextChannel, discord.VoiceChannel, discord.Thread, discord.ForumChannel]] = None, *, text: str):
+        """Create a reminder"""
+        timeconverter = UserFriendlyTime()
+        dt = await timeconverter.convert(ctx=ctx, argument=duration, now=datetime.now())
+        await self.create_reminder(ctx, dt.dt, channel, text)
+
+    @checks.has_permissions(PermissionLevel.REGULAR)
+    @commands.command(name='remindevery', aliases=['remindrepeat'])
+    async def remindevery(self, ctx: commands.Context, schedule: str, channel: Optional[Union[discord.TextChannel, discord.VoiceChannel, discord.Thread, discord.ForumChannel]] = None, *, text: str):
+        """
+        Create a recurring reminder
+
+        The schedule is either an interval or a quoted cron expression.
+
+        **Usage:**
+        {prefix}remindevery 1d Drink water
+        {prefix}remindevery 2h30m #general Stretch
+        {prefix}remindevery "0 9 * * 1-5" Daily standup
+        """
+        recurrence = parse_recurrence(schedule)
+        if recurrence is None:
+            embed = discord.Embed(title='Invalid schedule', description=f'``{schedule}`` is neither an interval of at least {MIN_RECURRENCE_INTERVAL} seconds (e.g. ``1d12h``) nor a valid cron expression.', color=self.bot.error_color)
+            return await ctx.send(embed=embed)
+        now = datetime.now()
+        await self.create_reminder(ctx, next_occurrence(recurrence, now, now), channel, text, recurrence)
+
     @checks.has_permissions(PermissionLevel.REGULAR)
     @commands.command(name='delreminder', aliases=['forgetreminder'])
     async def delreminder(self, ctx: commands.Context, reminder_id: int):
         """Delete a reminder"""
-        current_userdata = self.config.get(str(ctx.author.id), None)
-        userdata = {}
-        if not current_userdata:
-            reminder_id = 0
-            userdata["reminder_id"] = reminder_id
-            userdata["reminders"] = {}
-            self.config[str(ctx.author.id)] = userdata
-            await self.update_config()
-        current_userdata = self.config.get(str(ctx.author.id), None)
-        reminder_data = current_userdata["reminders"]
-        to_delete_reminder = reminder_data.get(str(reminder_id), None)
-        if not to_delete_reminder:
+        key = reminder_key(ctx.author.id, reminder_id)
+        result = await self.db.delete_one({"_id": key})
+        if result.deleted_count == 0:
             embed = discord.Embed(title='Reminder not found', description=f'A reminder with the given ID ``{reminder_id}`` was not found.', color=self.bot.error_color)
             return await ctx.send(embed=embed)
         else:
-            reminder_data.pop(str(reminder_id), None)
-            await self.update_config()
+            self.queue.discard(key)
             embed = discord.Embed(title='Reminder deleted', description=f'Your reminder ``{reminder_id}`` has been deleted successfully!', color=discord.Color.green())
             await ctx.send(embed=embed)
-            
+
     @checks.has_permissions(PermissionLevel.REGULAR)
     @commands.command(name='reminders', aliases=['listreminders','lreminders'])
-    async def reminders(self, ctx: commands.Context):
-        """List your reminders"""
-        current_userdata = self.config.get(str(ctx.author.id), None)
-        userdata = {}
-        if not current_userdata:
-            reminder_id = 0
-            userdata["reminder_id"] = reminder_id
-            userdata["reminders"] = {}
-            self.config[str(ctx.author.id)] = userdata
-            await self.update_config()
-        current_userdata = self.config.get(str(ctx.author.id), None)
-        reminder_data = current_userdata["reminders"]
-        if len(reminder_data.keys()) == 0:
+    async def reminders(self, ctx: commands.Context, *, filters: ReminderFilters):
+        """
+        List your reminders
+
+        Reminders are sorted by due time and can be filtered.
+
+        **Usage:**
+        {prefix}reminders
+        {prefix}reminders --before 2d --after 1h
+        {prefix}reminders --channel #general --keyword standup
+        """
+        query = {"user_id": str(ctx.author.id)}
+        timeconverter = UserFriendlyTime()
+        end_filter = {}
+        if filters.before:
+            dt = await timeconverter.convert(ctx=ctx, argument=filters.before, now=datetime.now())
+            end_filter["$lt"] = dt.dt
+        if filters.after:
+            dt = await timeconverter.convert(ctx=ctx, argument=filters.after, now=datetime.now())
+            end_filter["$gt"] = dt.dt
+        if end_filter:
+            query["end"] = end_filter
+        if filters.channel:
+            query["channel_id"] = filters.channel.id
+        if filters.keyword:
+            query["text"] = {"$regex": re.escape(filters.keyword), "$options": "i"}
+        total = await self.db.count_documents(query)
+        if total == 0:
             embed = discord.Embed(title='No reminders found', description=f'You do not have any active reminders!', color=self.bot.error_color)
             return await ctx.send(embed=embed)
         else:
-            embeds = []
-            for key, value in reminder_data.items():
-                reminder_id = key
-                remind_location = "Direct Message"
-                if not value["channel_id"] == None:
-                    remind_location = f'<#{value["channel_id"]}>'
-                timestamp = utils.format_dt(value["end"], "F")
-                embed = discord.Embed(title='Your Reminders', description=f'ID: ``{reminder_id}``\nReminding at: {timestamp}\nReminding in: {remind_location}\nReminder Text: {value["text"]}', color=self.bot.main_color)
-                embeds.append(embed)
-            session = EmbedPaginatorSession(ctx, *embeds)
-            await session.run()
-            
-    @tasks.loop(seconds=10)
+            view = ReminderListView(self, ctx, query, total)
+            await view.start()
+
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    @commands.group(name='reminderconfig', invoke_without_command=True)
+    async def reminderconfig(self, ctx: commands.Context):
+        """Reminder plugin configuration"""
+        await ctx.send_help(ctx.command)
+
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    @reminderconfig.command(name='concurrency')
+    async def reminderconfig_concurrency(self, ctx: commands.Context, limit: int):
+        """Sets how many reminder destinations are delivered to at the same time"""
+        if limit < 1:
+            embed = discord.Embed(title='Invalid limit', description='The concurrency limit has to be at least ``1``.', color=self.bot.error_color)
+            return await ctx.send(embed=embed)
+        self.config["delivery_concurrency"] = limit
+        await self.update_config()
+        embed = discord.Embed(title='Concurrency changed', description=f'Reminders are now delivered to up to ``{limit}`` destinations at the same time.', color=discord.Color.green())
+        await ctx.send(embed=embed)
+
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    @reminderconfig.command(name='coalesce')
+    async def reminderconfig_coalesce(self, ctx: commands.Context, seconds: int):
+        """
+        Merges reminders of the same destination coming due within the given window into one message
+
+        Use ``0`` to send every reminder as its own message.
+        """
+        if seconds < 0 or seconds > 300:
+            embed = discord.Embed(title='Invalid window', description='The coalescing window has to be between ``0`` and ``300`` seconds.', color=self.bot.error_color)
+            return await ctx.send(embed=embed)
+        self.config["coalesce_window"] = seconds
+        await self.update_config()
+        if seconds == 0:
+            description = 'Every reminder is now sent as its own message.'
+        else:
+            description = f'Reminders of the same destination coming due within ``{seconds}`` seconds are now sent as one message.'
+        embed = discord.Embed(title='Coalescing changed', description=description, color=discord.Color.green())
+        await ctx.send(embed=embed)
+
     async def reminder_task(self):
         await self.bot.wait_until_ready()
-        for key, value in self.config.items():
-            if key == '_id':
+        while True:
+            await self.lease.elected.wait()
+            await self.queue.wait()
+            if not self.lease.is_leader:
+                self.lease.elected.clear()
                 continue
-            user_id = str(key)
-            user_reminders = value['reminders'].copy()
-            for k, v in user_reminders.items():
-                now = datetime.now()
-                reminder_id = str(k)
-                reminder_text = v["text"]
-                if now >= v['end']:
-                    new_conf = self.config.copy()
-                    new_conf[user_id]["reminders"].pop(reminder_id, None)
-                    self.config = new_conf
-                    await self.update_config()
-                    if v["channel_id"] == None:
-                        try:
-                            user = await self.bot.get_or_fetch_user(int(user_id))
-                            if user:
-                                embed = discord.Embed(title=f'Reminder', description=f'{reminder_text}', color=self.bot.main_color)
-                                await user.send(embed=embed)
-                        except Exception as e:
-                            continue
-                    else:
-                        channel = self.bot.get_channel(int(v["channel_id"]))
-                        if channel:
-                            embed = discord.Embed(title=f'Reminder', description=f'{reminder_text}', color=self.bot.main_color)
-                            await channel.send(content=f'<@{user_id}>', embed=embed)
+            head = self.queue.peek()
+            if self.config["coalesce_window"] and head and head <= datetime.now():
+                # Collects the reminders coming due shortly after the first one.
+                await asyncio.sleep(self.config["coalesce_window"])
+            now = datetime.now()
+            entries = self.queue.pop_due(now)
+            if not entries:
+                continue
+            try:
+                reminders = await self.db.find({
+                    "_id": {"$in": [key for end, key in entries]},
+                    "end": {"$lte": now},
+                    "$or": [{"retry_at": None}, {"retry_at": {"$lte": now}}],
+                }).sort("end", 1).to_list(None)
+                if reminders:
+                    await self.deliver_reminders(reminders)
+            except Exception:
+                logger.exception('Error delivering reminders')
+                for end, key in entries:
+                    self.queue.push(end, key)
+                # The next heartbeat reloads the queue and moves reminders stuck in the outbox back to pending.
+                self.queue_loaded = False
+                await asyncio.sleep(RETRY_BASE_DELAY)
+
+    @staticmethod
+    def reminder_destination(reminder: dict):
+        if reminder["channel_id"] == None:
+            return ('user', reminder["user_id"])
+        return ('channel', str(reminder["channel_id"]))
+
+    async def deliver_reminders(self, reminders: list):
+        """
+        Delivers due reminders through a bounded pool of destination workers.
+
+        Reminders sharing a destination are sent one after another in due order,
+        different destinations are served concurrently. With coalescing enabled
+        they are merged into messages of up to 10 embeds and 6000 characters.
+        Due reminders are moved into the ``delivering`` state first and are only
+        deleted once sent. Transient failures are rescheduled with exponential backoff,
+        together with the following reminders of the same destination to keep their order.
+        """
+        await self.db.update_many({"_id": {"$in": [r["_id"] for r in reminders]}}, {"$set": {"state": "delivering"}})
+        destinations = defaultdict(list)
+        for reminder in reminders:
+            destinations[self.reminder_destination(reminder)].append(reminder)
+        semaphore = asyncio.Semaphore(self.config["delivery_concurrency"])
+        operations = []
+        reschedules = []
+
+        chunk_size = MAX_EMBEDS_PER_MESSAGE if self.config["coalesce_window"] else 1
+
+        async def worker(batch):
+            chunks = chunk_reminders(batch, chunk_size)
+            async with semaphore:
+                for index, chunk in enumerate(chunks):
+                    try:
+                        await self.deliver_reminder(chunk)
+                    except Exception as e:
+                        attempts = max(r.get("attempts", 0) for r in chunk)
+                        keys = ', '.join(r["_id"] for r in chunk)
+                        delay = retry_delay(e, attempts)
+                        if delay is None:
+                            logger.exception('Dropping reminders %s after failed delivery', keys)
+                        else:
+                            logger.warning('Delivery of reminders %s failed, retrying in %.1fs: %s', keys, delay, e)
+                            retry_at = datetime.now() + timedelta(seconds=delay)
+                            for pending in [r for c in chunks[index:] for r in c]:
+                                operations.append(UpdateOne(
+                                    {"_id": pending["_id"]},
+                                    {"$set": {"state": "pending", "retry_at": retry_at}, "$inc": {"attempts": 1 if pending in chunk else 0}},
+                                ))
+                                reschedules.append((retry_at, pending["_id"]))
+                            return
+                    for reminder in chunk:
+                        if reminder.get("recurrence"):
+                            # Only the next occurrence is stored and scheduled.
+                            end = next_occurrence(reminder["recurrence"], reminder["end"], datetime.now())
+                            operations.append(UpdateOne(
+                                {"_id": reminder["_id"]},
+                                {"$set": {"state": "pending", "end": end}, "$unset": {"retry_at": "", "attempts": ""}},
+                            ))
+                            reschedules.append((end, reminder["_id"]))
+                        else:
+                            operations.append(DeleteOne({"_id": reminder["_id"]}))
+
+        await asyncio.gather(*(worker(batch) for batch in destinations.values()))
+        if operations:
+            await self.db.bulk_write(operations, ordered=False)
+        for due_at, key in reschedules:
+            self.queue.push(due_at, key)
+
+    async def deliver_reminder(self, reminders: list):
+        """
+        Sends reminders of one destination as a single message, missing users or channels are treated as delivered.
+        """
+        first = reminders[0]
+        embeds = [discord.Embed(title=f'Reminder', description=f'{r["text"]}', color=self.bot.main_color) for r in reminders]
+        if first["channel_id"] == None:
+            user = await self.bot.get_or_fetch_user(int(first["user_id"]))
+            if user:
+                await user.send(embeds=embeds)
+        else:
+            channel = self.bot.get_channel(int(first["channel_id"]))
+            if channel:
+                mentions = ' '.join(dict.fromkeys(f'<@{r["user_id"]}>' for r in reminders))
+                await channel.send(content=mentions, embeds=embeds)
 
 async def setup(bot):
-    await bot.add_cog(Reminder(bot))
\ No newline at end of file
+    await bot.add_cog(Reminder(bot))
@@ -0,0 +1,67 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip('core')
+mongomock_motor = pytest.importorskip('mongomock_motor')
+
+from reminder import DeliveryLease, ReminderQueue
+
+
+class Clock:
+    def __init__(self):
+        self.now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += timedelta(seconds=seconds)
+
+
+def make_collection():
+    return mongomock_motor.AsyncMongoMockClient()['plugins']['Reminder']
+
+
+def test_lease_single_leader_and_takeover():
+    async def scenario():
+        db = make_collection()
+        clock = Clock()
+        first = DeliveryLease(db, 'first', ttl=15, clock=clock)
+        second = DeliveryLease(db, 'second', ttl=15, clock=clock)
+
+        assert await first.acquire()
+        assert not await second.acquire()
+        assert first.is_leader and not second.is_leader
+
+        clock.advance(5)
+        assert await first.acquire()
+        assert not await second.acquire()
+
+        # The leader stops renewing, another instance takes over once the lease expires.
+        clock.advance(16)
+        assert not first.is_leader
+        assert await second.acquire()
+        assert not await first.acquire()
+        assert not first.elected.is_set() and second.elected.is_set()
+
+        await second.release()
+        assert await first.acquire()
+
+    asyncio.run(scenario())
+
+
+def test_queue_ignores_duplicate_entries():
+    async def scenario():
+        queue = ReminderQueue()
+        now = datetime.now()
+        queue.load([(now, '1-1')])
+        queue.push(now, '1-1')
+        queue.push(now + timedelta(seconds=5), '1-2')
+        queue.push(now + timedelta(seconds=5), '1-2')
+        assert [key for _, key in queue.pop_due(now + timedelta(seconds=10))] == ['1-1', '1-2']
+        queue.push(now, '1-1')
+        assert len(queue) == 1
+
+    asyncio.run(scenario())
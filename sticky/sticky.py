@@ -5,9 +5,14 @@ import os
 from contextlib import suppress
 
 import asyncio
+import heapq
+import itertools
+import json
 import discord
 from discord.ext import commands, tasks
 from discord import utils
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 
 from core import checks
 from core.models import PermissionLevel, getLogger
@@ -15,6 +20,115 @@ from core.paginator import EmbedPaginatorSession, MessagePaginatorSession
 
 logger = getLogger(__name__)
 
+# Discord allows 50 requests per second per bot.
+GLOBAL_RATE_LIMIT = 50
+PRIORITY_SEND = 0
+PRIORITY_DELETE = 1
+SCHEMA_VERSION = 2
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously with ``rate`` tokens per second.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = asyncio.get_event_loop().time()
+
+    def refill(self):
+        now = asyncio.get_event_loop().time()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            self.refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class StickyDispatcher:
+    """
+    Central queue for the API calls of all sticky channels.
+
+    Calls first pass a per-channel token bucket, then wait in a priority queue
+    that is drained at the rate of a global token bucket. The global rate is a share
+    of the bot's API budget, so sticky reposts can never starve the rest of the bot.
+    """
+    def __init__(self, share: float, channel_rate: float = 1, channel_burst: float = 2):
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self.channel_buckets = {}
+        self.global_bucket = None
+        self.set_share(share)
+        self._queue = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._worker = None
+
+    def set_share(self, share: float):
+        rate = GLOBAL_RATE_LIMIT * share
+        self.global_bucket = TokenBucket(rate, max(rate, 1))
+
+    def start(self):
+        self._worker = asyncio.get_event_loop().create_task(self.run())
+
+    def stop(self):
+        if self._worker:
+            self._worker.cancel()
+        for *_, future in self._queue:
+            future.cancel()
+        self._queue.clear()
+
+    def __len__(self):
+        return len(self._queue)
+
+    async def submit(self, channel_id: int, priority: int, call):
+        """
+        Queues ``call`` (a coroutine function without arguments) and returns its result.
+        """
+        bucket = self.channel_buckets.get(channel_id)
+        if bucket is None:
+            bucket = self.channel_buckets[channel_id] = TokenBucket(self.channel_rate, self.channel_burst)
+        await bucket.acquire()
+        future = asyncio.get_event_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._counter), call, future))
+        self._wakeup.set()
+        return await future
+
+    def forget(self, channel_id: int):
+        self.channel_buckets.pop(channel_id, None)
+
+    async def run(self):
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            await self.global_bucket.acquire()
+            if not self._queue:
+                continue
+            priority, _, call, future = heapq.heappop(self._queue)
+            if future.cancelled():
+                continue
+            asyncio.get_event_loop().create_task(self.execute(call, future))
+
+    @staticmethod
+    async def execute(call, future):
+        try:
+            result = await call()
+        except Exception as e:
+            if not future.cancelled():
+                future.set_exception(e)
+        else:
+            if not future.cancelled():
+                future.set_result(result)
+
+
 class Sticky(commands.Cog):
     """
     Sticky - Manage Sticky Messages
@@ -22,51 +136,148 @@ class Sticky(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.db = self.bot.plugin_db.get_partition(self)
-        self.config = None
-        self.default_config = {}
-        self.default_channel_config = {"message": "Sticky message", "stopped": False, "color": str(discord.Color.blurple().value)}
+        self.config = {}
+        self.default_channel_config = {"message": "Sticky message", "stopped": False, "color": str(discord.Color.blurple().value), "tolerance": 0}
         self.sticked_messages = {}
         self.delay = 5
-        self.locked_channels = set()
+        self.max_delay = 30
+        self.last_activity = {}
+        self.pending_reposts = {}
+        self.dirty_channels = set()
+        self.messages_since_sticky = {}
+        self.sending = set()
+        self.deleted_stickies = set()
+        self.payloads = {}
+        self.settings = {"api_share": 0.1}
+        self.dispatcher = StickyDispatcher(self.settings["api_share"])
 
     async def cog_load(self):
-        self.config = await self.db.find_one({"_id": "sticky"})
-        if self.config is None:
-            self.config = self.default_config
-            await self.update_config()
-        missing = []
-        for key in self.default_config.keys():
-            if key not in self.config:
-                missing.append(key)
-        if missing:
-            for key in missing:
-                self.config[key] = self.default_config[key]
-        channel_ids = []
-        for k, v in self.config.items():
-            channel_ids = []
-            if not k == "_id":
-                channel_ids.append(k)
-        if channel_ids:
-            for c in channel_ids:
-                missing_default_channel_keys = []
-                channel_config = self.config[c]
-                for default_channel_conf_key in self.default_channel_config.keys():
-                    if default_channel_conf_key not in channel_config:
-                        missing_default_channel_keys.append(default_channel_conf_key)
-                if missing_default_channel_keys:
-                    for missing_key in missing_default_channel_keys:
-                        channel_config[missing_key] = self.default_channel_config[missing_key]
-                self.config[c] = channel_config
-        await self.update_config()
-
-
-
-    async def update_config(self):
+        settings = await self.db.find_one({"_id": "settings"})
+        if settings:
+            self.settings.update(settings)
+        if self.settings.get("schema_version", 1) < SCHEMA_VERSION:
+            await self.migrate_config()
+        self.config = {}
+        async for channel_config in self.db.find({"channel_id": {"$exists": True}}):
+            channel_id = channel_config["channel_id"]
+            missing = {k: v for k, v in self.default_channel_config.items() if k not in channel_config}
+            if missing:
+                channel_config.update(missing)
+                await self.update_channel(channel_id, **missing)
+            self.config[channel_id] = channel_config
+        self.dispatcher.set_share(self.settings["api_share"])
+        self.dispatcher.start()
+        self.flush_sticky_state.start()
+        self.bot.loop.create_task(self.restore_sticky_messages())
+
+    async def migrate_config(self):
+        """
+        Splits the single ``sticky`` config document into one document per sticky channel.
+        """
+        old_config = await self.db.find_one({"_id": "sticky"})
+        channels = []
+        if old_config:
+            for channel_id, channel_config in old_config.items():
+                if channel_id == "_id":
+                    continue
+                channels.append({**self.default_channel_config, **channel_config, "_id": channel_id, "channel_id": channel_id})
+        if channels:
+            # Documents inserted by an interrupted earlier migration are kept as they are.
+            with suppress(BulkWriteError):
+                await self.db.insert_many(channels, ordered=False)
+        await self.db.delete_one({"_id": "sticky"})
+        self.settings["schema_version"] = SCHEMA_VERSION
         await self.db.find_one_and_update(
-            {"_id": "sticky"},
-            {"$set": self.config},
+            {"_id": "settings"},
+            {"$set": {"schema_version": SCHEMA_VERSION}},
             upsert=True,
         )
+        logger.info('Migrated %s sticky channels to the per-channel storage.', len(channels))
+
+    async def cog_unload(self):
+        for task in self.pending_reposts.values():
+            task.cancel()
+        self.flush_sticky_state.cancel()
+        self.dispatcher.stop()
+        await self.flush_last_message_ids()
+
+    async def restore_sticky_messages(self):
+        """
+        Rebuilds the sticky message map from the stored IDs without fetching the messages.
+
+        Stickies that are no longer the latest message of their channel, e.g. because
+        of messages sent while the bot was offline, are reposted in one concurrent pass.
+        """
+        await self.bot.wait_until_ready()
+        outdated = []
+        for channel_id, channel_conf in list(self.config.items()):
+            if not channel_conf.get('last_message_id'):
+                continue
+            channel = self.bot.get_channel(int(channel_id))
+            if channel is None:
+                logger.warning('Sticky channel %s no longer exists.', channel_id)
+                continue
+            self.sticked_messages.setdefault(channel_id, channel.get_partial_message(int(channel_conf['last_message_id'])))
+            if channel_conf['stopped'] is False and channel.last_message_id and str(channel.last_message_id) != channel_conf['last_message_id']:
+                outdated.append(channel)
+        for channel in outdated:
+            self.schedule_repost(channel)
+        if outdated:
+            await asyncio.gather(*[t for t in self.pending_reposts.values()], return_exceptions=True)
+            logger.info('Reconciled %s outdated sticky messages.', len(outdated))
+
+    @staticmethod
+    def build_payload(channel_conf):
+        if channel_conf.get('embeds'):
+            embeds = [discord.Embed.from_dict(e) for e in channel_conf['embeds']]
+        else:
+            embeds = [discord.Embed(description=channel_conf['message'], color=discord.Color(int(channel_conf['color'])))]
+        payload = {"embeds": embeds}
+        if channel_conf.get('buttons'):
+            view = discord.ui.View(timeout=None)
+            for button in channel_conf['buttons']:
+                view.add_item(discord.ui.Button(label=button['label'], url=button['url']))
+            payload["view"] = view
+        return payload
+
+    def get_payload(self, channel_id):
+        """
+        Returns the send payload of a sticky channel, compiled once per config change.
+        """
+        payload = self.payloads.get(str(channel_id))
+        if payload is None:
+            payload = self.payloads[str(channel_id)] = self.build_payload(self.config[str(channel_id)])
+        return payload
+
+    async def update_channel(self, channel_id, **fields):
+        await self.db.update_one({"_id": str(channel_id)}, {"$set": fields})
+
+    async def flush_last_message_ids(self):
+        """
+        Persists the ``last_message_id`` of all channels reposted since the last flush.
+        """
+        if not self.dirty_channels:
+            return
+        dirty = self.dirty_channels
+        self.dirty_channels = set()
+        changes = [
+            UpdateOne({"_id": c}, {"$set": {"last_message_id": self.config[c]['last_message_id']}})
+            for c in dirty if c in self.config
+        ]
+        if not changes:
+            return
+        try:
+            await self.db.bulk_write(changes, ordered=False)
+        except Exception:
+            self.dirty_channels |= dirty
+            raise
+
+    @tasks.loop(seconds=30)
+    async def flush_sticky_state(self):
+        try:
+            await self.flush_last_message_ids()
+        except Exception:
+            logger.exception('Error persisting sticky message IDs')
 
 
     @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
@@ -83,18 +294,20 @@ class Sticky(commands.Cog):
         if not all(needed_perms):
             embed = discord.Embed(description=f'The bot is missing permissions in channel {channel.mention}.\nNeeded Permissions: Send_Messages, Embed_Links', color=self.bot.error_color)
             return await ctx.send(embed=embed)
-        sticky_channel_data = {}
+        sticky_channel_data = {"_id": str(channel.id), "channel_id": str(channel.id)}
         sticky_channel_data['message'] = str(message)
         sticky_channel_data['stopped'] = False
         sticky_channel_data['color'] = str(discord.Color.blurple().value)
+        sticky_channel_data['tolerance'] = 0
 
-        embed = discord.Embed(description=sticky_channel_data['message'], color=discord.Color.blurple())
-        msg = await channel.send(embed=embed)
+        payload = self.build_payload(sticky_channel_data)
+        msg = await channel.send(**payload)
 
         sticky_channel_data['last_message_id'] = str(msg.id)
         self.sticked_messages[str(channel.id)] = msg
+        self.payloads[str(channel.id)] = payload
         self.config[str(channel.id)] = sticky_channel_data
-        await self.update_config()
+        await self.db.replace_one({"_id": str(channel.id)}, sticky_channel_data, upsert=True)
         logger.info('Sticky Message added by %s to channel %s (%s)', ctx.author, channel.name, channel.id)
         embed = discord.Embed(description=f'Sticky message enabled in {channel.mention}.', color=discord.Color.green())
         await ctx.send(embed=embed)
@@ -110,11 +323,15 @@ class Sticky(commands.Cog):
             embed = discord.Embed(description=f'This channel has no sticky message enabled.', color=self.bot.error_color)
             return await ctx.send(embed=embed)
         self.config.pop(str(channel.id), None)
+        pending_repost = self.pending_reposts.pop(channel.id, None)
+        if pending_repost:
+            pending_repost.cancel()
         self.sticked_messages.pop(str(channel.id), None)
-        await self.db.find_one_and_update(
-            {"_id": "sticky"},
-            {"$unset": {str(channel.id):current_channel_settings}}
-        )
+        self.payloads.pop(str(channel.id), None)
+        self.dirty_channels.discard(str(channel.id))
+        self.dispatcher.forget(channel.id)
+        self.deleted_stickies.discard(channel.id)
+        await self.db.delete_one({"_id": str(channel.id)})
         logger.info('Sticky Message removed from %s (%s) by %s', channel.name, channel.id, ctx.author)
         embed = discord.Embed(description=f'Sticky message removed from {channel}.', color=discord.Color.green())
         await ctx.send(embed=embed)
@@ -129,7 +346,7 @@ class Sticky(commands.Cog):
             embed = discord.Embed(description=f'This channel has no sticky message enabled.', color=self.bot.error_color)
             return await ctx.send(embed=embed)
         self.config[str(channel.id)]['stopped'] = True
-        await self.update_config()
+        await self.update_channel(channel.id, stopped=True)
         embed = discord.Embed(description=f'Sticky message paused in {channel}.', color=discord.Color.green())
         await ctx.send(embed=embed)
 
@@ -143,7 +360,7 @@ class Sticky(commands.Cog):
             embed = discord.Embed(description=f'This channel has no sticky message enabled.', color=self.bot.error_color)
             return await ctx.send(embed=embed)
         self.config[str(channel.id)]['stopped'] = False
-        await self.update_config()
+        await self.update_channel(channel.id, stopped=False)
         embed = discord.Embed(description=f'Sticky message started in {channel}.', color=discord.Color.green())
         await ctx.send(embed=embed)
 
@@ -157,41 +374,186 @@ class Sticky(commands.Cog):
             embed = discord.Embed(description=f'This channel has no sticky message enabled.', color=self.bot.error_color)
             return await ctx.send(embed=embed)
         self.config[str(channel.id)]['color'] = str(color.value)
-        await self.update_config()
+        self.payloads.pop(str(channel.id), None)
+        await self.update_channel(channel.id, color=str(color.value))
         embed = discord.Embed(description=f'Sticky message embed color changed in {channel.mention}.', color=discord.Color.green())
         await ctx.send(embed=embed)
 
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    @commands.command(name='stickrich')
+    async def stickrich(self, ctx: commands.Context, channel: Union[discord.TextChannel, discord.VoiceChannel, discord.Thread], *, data: str):
+        """
+        Sets rich content for a sticky message: multiple embeds, fields, images and link buttons.
+
+        The content is given as JSON with an ``embeds`` list (Discord embed objects, max 10)
+        and an optional ``buttons`` list (``label`` and ``url``, max 25).
+        Use ``reset`` to go back to the plain sticky message.
+
+        **Usage:**
+        {prefix}stickrich #rules {"embeds": [{"title": "Rules", "fields": [{"name": "1", "value": "Be nice"}]}], "buttons": [{"label": "Docs", "url": "https://example.com"}]}
+        {prefix}stickrich #rules reset
+        """
+        if not self.config.get(str(channel.id), None):
+            embed = discord.Embed(description=f'This channel has no sticky message enabled.', color=self.bot.error_color)
+            return await ctx.send(embed=embed)
+        if data.strip().lower() == 'reset':
+            embeds, buttons = [], []
+        else:
+            content = data.strip().removeprefix('```json').removeprefix('```').removesuffix('```')
+            try:
+                content = json.loads(content)
+                embeds = content.get('embeds', [])
+                buttons = content.get('buttons', [])
+                if not 1 <= len(embeds) <= 10 or len(buttons) > 25:
+                    raise ValueError('A sticky needs 1 to 10 embeds and at most 25 buttons.')
+                if sum(len(discord.Embed.from_dict(e)) for e in embeds) > 6000:
+                    raise ValueError('The embeds exceed 6000 characters in total.')
+                for button in buttons:
+                    if not str(button['url']).startswith(('http://', 'https://')):
+                        raise ValueError(f'Invalid button URL ``{button["url"]}``.')
+                buttons = [{"label": str(b['label'])[:80], "url": str(b['url'])} for b in buttons]
+            except (ValueError, TypeError, KeyError, AttributeError) as e:
+                embed = discord.Embed(description=f'Invalid sticky content: {e}', color=self.bot.error_color)
+                return await ctx.send(embed=embed)
+        self.config[str(channel.id)]['embeds'] = embeds
+        self.config[str(channel.id)]['buttons'] = buttons
+        self.payloads.pop(str(channel.id), None)
+        await self.update_channel(channel.id, embeds=embeds, buttons=buttons)
+        embed = discord.Embed(description=f'Sticky message content changed in {channel.mention}.', color=discord.Color.green())
+        await ctx.send(embed=embed)
+
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    @commands.command(name='stickbudget')
+    async def stickbudget(self, ctx: commands.Context, percent: int):
+        """
+        Sets the share of the bot's API budget sticky messages may use, in percent.
+
+        Reposts beyond the budget are queued, sends are preferred over deletes.
+        """
+        if percent < 1 or percent > 50:
+            embed = discord.Embed(description=f'The budget has to be between 1 and 50 percent.', color=self.bot.error_color)
+            return await ctx.send(embed=embed)
+        self.settings["api_share"] = percent / 100
+        self.dispatcher.set_share(self.settings["api_share"])
+        await self.db.find_one_and_update(
+            {"_id": "settings"},
+            {"$set": {"api_share": self.settings["api_share"]}},
+            upsert=True,
+        )
+        embed = discord.Embed(description=f'Sticky messages may now use {percent}% of the API budget.', color=discord.Color.green())
+        await ctx.send(embed=embed)
+
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    @commands.command(name='sticktolerance')
+    async def sticktolerance(self, ctx: commands.Context, channel: Union[discord.TextChannel, discord.VoiceChannel, discord.Thread], messages: int):
+        """
+        Only reposts the sticky message once it was pushed up by more than the given amount of messages.
+
+        Use ``0`` to repost on every message.
+        """
+        if not self.config.get(str(channel.id), None):
+            embed = discord.Embed(description=f'This channel has no sticky message enabled.', color=self.bot.error_color)
+            return await ctx.send(embed=embed)
+        if messages < 0 or messages > 50:
+            embed = discord.Embed(description=f'The tolerance has to be between 0 and 50 messages.', color=self.bot.error_color)
+            return await ctx.send(embed=embed)
+        self.config[str(channel.id)]['tolerance'] = messages
+        await self.update_channel(channel.id, tolerance=messages)
+        embed = discord.Embed(description=f'Sticky message tolerance changed to {messages} messages in {channel.mention}.', color=discord.Color.green())
+        await ctx.send(embed=embed)
+
+    def schedule_repost(self, channel):
+        """
+        Schedules a trailing-edge repost of the sticky message.
+
+        The repost happens once the channel was quiet for ``self.delay`` seconds,
+        but at the latest ``self.max_delay`` seconds after the first message of a burst.
+        """
+        self.last_activity[channel.id] = self.bot.loop.time()
+        if channel.id not in self.pending_reposts:
+            self.pending_reposts[channel.id] = self.bot.loop.create_task(self.debounced_repost(channel))
+
+    async def debounced_repost(self, channel):
+        try:
+            first_activity = self.last_activity[channel.id]
+            while True:
+                deadline = min(self.last_activity[channel.id] + self.delay, first_activity + self.max_delay)
+                now = self.bot.loop.time()
+                if now < deadline:
+                    await asyncio.sleep(deadline - now)
+                    continue
+                started = now
+                channel_conf = self.config.get(str(channel.id), None)
+                if not channel_conf or channel_conf['stopped'] is True:
+                    return
+                try:
+                    await self.repost(channel, channel_conf)
+                except Exception:
+                    logger.exception('Error reposting sticky message in channel %s', channel.id)
+                    return
+                # Messages sent during the repost start a new burst, unless they are within the tolerance.
+                if self.last_activity[channel.id] <= started:
+                    return
+                if self.messages_since_sticky.get(channel.id, 0) <= channel_conf.get('tolerance', 0):
+                    return
+                first_activity = self.last_activity[channel.id]
+        finally:
+            # stickremove may already have replaced or removed this task.
+            if self.pending_reposts.get(channel.id) is asyncio.current_task():
+                del self.pending_reposts[channel.id]
+
+    async def repost(self, channel, channel_conf):
+        last_sticked_msg = self.sticked_messages.get(str(channel.id), None)
+        if channel.id in self.deleted_stickies:
+            # The old sticky was deleted by someone else, there is nothing left to delete.
+            self.deleted_stickies.discard(channel.id)
+        elif last_sticked_msg is None and channel_conf.get('last_message_id'):
+            last_sticked_msg = channel.get_partial_message(int(channel_conf['last_message_id']))
+        if last_sticked_msg:
+            with suppress(discord.NotFound):
+                await self.dispatcher.submit(channel.id, PRIORITY_DELETE, last_sticked_msg.delete)
+        payload = self.get_payload(channel.id)
+        # Reset before sending, so messages arriving meanwhile do not trigger another repost.
+        seen = self.messages_since_sticky.get(channel.id, 0)
+        self.messages_since_sticky[channel.id] = 0
+        self.sending.add(channel.id)
+        try:
+            new_msg = await self.dispatcher.submit(channel.id, PRIORITY_SEND, lambda: channel.send(**payload))
+        except BaseException:
+            self.messages_since_sticky[channel.id] += seen
+            raise
+        finally:
+            self.sending.discard(channel.id)
+        if str(channel.id) not in self.config:
+            # The sticky was removed while the message was waiting in the dispatcher.
+            with suppress(discord.HTTPException):
+                await new_msg.delete()
+            return
+        self.config[str(channel.id)]['last_message_id'] = str(new_msg.id)
+        self.dirty_channels.add(str(channel.id))
+        self.sticked_messages[str(channel.id)] = new_msg
+
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
-        if isinstance(message.channel, discord.DMChannel) or message.author.bot or message.content.startswith(self.bot.prefix):
+        if isinstance(message.channel, discord.DMChannel):
             return
         await self.bot.wait_until_ready()
         channel_id = message.channel.id
         channel_conf = self.config.get(str(channel_id), None)
-        if not channel_conf or channel_id in self.locked_channels or channel_conf['stopped'] is True:
+        if not channel_conf or channel_conf['stopped'] is True or str(message.id) == channel_conf.get('last_message_id'):
             return
-        self.locked_channels.add(channel_id)
-        last_sticked_msg = None
-        if self.sticked_messages.get(str(channel_id), None):
-            last_sticked_msg = self.sticked_messages[str(channel_id)]
-        else:
-            with suppress(discord.NotFound):
-                r = await message.channel.fetch_message(int(channel_conf['last_message_id']))
-                if r:
-                    last_sticked_msg = r
-        if last_sticked_msg:
-            await asyncio.sleep(self.delay)
-            with suppress(discord.NotFound):
-                await last_sticked_msg.delete()
-
-        
-        embed = discord.Embed(description=channel_conf['message'], color=discord.Color(int(channel_conf['color'])))
-        new_msg = await message.channel.send(embed=embed)
-        self.config[str(channel_id)]['last_message_id'] = str(new_msg.id)
-        await self.update_config()
-        self.sticked_messages[str(channel_id)] = new_msg
-        with suppress(KeyError):
-            self.locked_channels.remove(channel_id)
+        # The new sticky usually arrives through the gateway before its send returns.
+        if channel_id in self.sending and message.author.id == self.bot.user.id:
+            return
+        # Every message pushes the sticky up, only user messages trigger a repost.
+        # After a restart the position is unknown, so the first message reposts.
+        tolerance = channel_conf.get('tolerance', 0)
+        self.messages_since_sticky[channel_id] = self.messages_since_sticky.get(channel_id, tolerance) + 1
+        if message.author.bot or message.content.startswith(self.bot.prefix):
+            return
+        if self.messages_since_sticky[channel_id] <= tolerance:
+            return
+        self.schedule_repost(message.channel)
 
     @commands.Cog.listener()
     async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
@@ -201,21 +563,14 @@ class Sticky(commands.Cog):
             if payload.message_id == int(channel_conf['last_message_id']):
                 if channel_conf['stopped'] is True:
                     return
-                if payload.channel_id in self.locked_channels:
+                # A running repost deletes the old sticky itself.
+                if payload.channel_id in self.pending_reposts:
                     return
-                self.locked_channels.add(payload.channel_id)
+                self.sticked_messages.pop(str(payload.channel_id), None)
+                self.deleted_stickies.add(payload.channel_id)
                 channel = self.bot.get_channel(payload.channel_id)
-                await asyncio.sleep(self.delay)
-                embed = discord.Embed(description=channel_conf['message'], color=discord.Color(int(channel_conf['color'])))
-                new_msg = await channel.send(embed=embed)
-                self.config[str(payload.channel_id)]['last_message_id'] = str(new_msg.id)
-                await self.update_config()
-                self.sticked_messages[str(payload.channel_id)] = new_msg
-                with suppress(KeyError):
-                    self.locked_channels.remove(payload.channel_id)
-
-        
-
+                if channel:
+                    self.schedule_repost(channel)
 
 
 async def setup(bot):
@@ -0,0 +1,92 @@
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('core')
+
+from sticky import Sticky
+
+CHANNEL_ID = 10
+BOT_USER = SimpleNamespace(id=1, bot=True)
+USER = SimpleNamespace(id=2, bot=False)
+message_ids = itertools.count(100)
+
+
+class Channel:
+    """Sends messages the way Discord delivers them: the gateway event arrives before the HTTP response."""
+    def __init__(self, cog):
+        self.id = CHANNEL_ID
+        self.cog = cog
+
+    def get_partial_message(self, message_id):
+        self.cog.partial_messages += 1
+        return make_message(self, BOT_USER)
+
+    async def send(self, **payload):
+        message = make_message(self, BOT_USER)
+        await self.cog.on_message(message)
+        return message
+
+
+def make_message(channel, author):
+    async def delete():
+        pass
+    return SimpleNamespace(id=next(message_ids), channel=channel, author=author, content='hello', delete=delete)
+
+
+def make_cog(tolerance):
+    async def wait_until_ready():
+        pass
+    bot = SimpleNamespace(
+        plugin_db=SimpleNamespace(get_partition=lambda cog: None),
+        wait_until_ready=wait_until_ready,
+        prefix='?',
+        user=BOT_USER,
+    )
+    cog = Sticky(bot)
+    cog.config[str(CHANNEL_ID)] = {**cog.default_channel_config, 'tolerance': tolerance, 'last_message_id': '1'}
+    cog.scheduled = 0
+    cog.partial_messages = 0
+
+    def schedule_repost(channel):
+        cog.scheduled += 1
+    cog.schedule_repost = schedule_repost
+    return cog
+
+
+@pytest.mark.parametrize('tolerance', [0, 1, 3])
+def test_repost_after_tolerance_is_exceeded(tolerance):
+    async def scenario():
+        cog = make_cog(tolerance)
+        cog.dispatcher.start()
+        channel = Channel(cog)
+        await cog.repost(channel, cog.config[str(CHANNEL_ID)])
+        assert cog.messages_since_sticky[CHANNEL_ID] == 0
+
+        for _ in range(tolerance):
+            await cog.on_message(make_message(channel, USER))
+        assert cog.scheduled == 0
+
+        await cog.on_message(make_message(channel, USER))
+        assert cog.scheduled == 1
+        cog.dispatcher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_repost_skips_deleting_a_sticky_deleted_by_someone_else():
+    async def scenario():
+        cog = make_cog(0)
+        cog.dispatcher.start()
+        channel = Channel(cog)
+        cog.bot.get_channel = lambda channel_id: channel
+        await cog.on_raw_message_delete(SimpleNamespace(channel_id=CHANNEL_ID, message_id=1))
+        assert cog.scheduled == 1
+        await cog.repost(channel, cog.config[str(CHANNEL_ID)])
+        assert cog.partial_messages == 0
+        assert CHANNEL_ID not in cog.deleted_stickies
+        cog.dispatcher.stop()
+
+    asyncio.run(scenario())